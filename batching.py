@@ -0,0 +1,67 @@
+from tokens import estimate_tokens
+
+BATCH_TOKEN_BUDGET = 1200  # post text per batch prompt; the rubric and answer need the rest of a 2048 context
+MAX_BATCH_POSTS = 8
+
+
+def pack_batches(posts, token_budget=BATCH_TOKEN_BUDGET, max_posts=MAX_BATCH_POSTS):
+    """ Greedily groups {post_id: text} (in order) into batches that fit the token budget. """
+    batches, current, used = [], {}, 0
+    for post_id, text in posts.items():
+        cost = estimate_tokens(text)
+        if current and (used + cost > token_budget or len(current) >= max_posts):
+            batches.append(current)
+            current, used = {}, 0
+        current[post_id] = text
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def valid_score(value):
+    try:
+        score = int(value)
+    except (TypeError, ValueError):
+        return None
+    return score if 1 <= score <= 10 and float(value) == score else None
+
+
+def score_batch(batch, batch_fn, single_fn, stats):
+    """
+    Scores one batch with a single prompt. Entries the model left out or malformed are split in
+    half and retried; a post that still fails on its own falls back to the per-post prompt, and is
+    left out of the scores if that fails too.
+    """
+    if len(batch) == 1:
+        post_id, text = next(iter(batch.items()))
+        stats["single"] = stats.get("single", 0) + 1
+        result = single_fn(text)
+        return {post_id: result["wellbeing_score"]} if "wellbeing_score" in result else {}
+
+    stats["batched"] = stats.get("batched", 0) + 1
+    response = batch_fn(batch).get("scores", {})
+    scores, missing = {}, {}
+    for post_id, text in batch.items():
+        score = valid_score(response.get(post_id)) if isinstance(response, dict) else None
+        if score is None:
+            missing[post_id] = text
+        else:
+            scores[post_id] = score
+
+    if missing:
+        stats["retried_posts"] = stats.get("retried_posts", 0) + len(missing)
+        items = list(missing.items())
+        half = max(1, len(items) // 2)
+        for part in (dict(items[:half]), dict(items[half:])):
+            if part:
+                scores.update(score_batch(part, batch_fn, single_fn, stats))
+    return scores
+
+
+def score_posts_batched(posts, batch_fn, single_fn, stats):
+    """ Well-being scores for {post_id: text}, packing several posts into each prompt. """
+    scores = {}
+    for batch in pack_batches(posts):
+        scores.update(score_batch(batch, batch_fn, single_fn, stats))
+    return scores
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from segmenter import default_cache
+from tokens import estimate_tokens
+
+# Context window (tokens) each model is run with; Ollama uses 2048 unless num_ctx is raised
+MODEL_CONTEXT = {'llama2': 2048, 'llama3.1': 2048, 'llama3.2': 2048, 'mistral': 2048, 'gemma2': 2048}
+DEFAULT_CONTEXT = 2048
+PROMPT_OVERHEAD_TOKENS = 350  # instructions + response format of the evidence prompts
+OUTPUT_RESERVE_TOKENS = 512  # room for the JSON answer
+OVERLAP_SENTENCES = 1
+CHUNK_WORKERS = 4
+
+
+def chunk_budget(model):
+    """ Tokens of post text that fit in one evidence prompt for `model`. """
+    return MODEL_CONTEXT.get(model, DEFAULT_CONTEXT) - PROMPT_OVERHEAD_TOKENS - OUTPUT_RESERVE_TOKENS
+
+
+def sentence_spans(text):
+    """ (start, end) character spans of the sentences in `text`, from the shared segmentation cache. """
+    return default_cache().spans(text)
+
+
+def chunk_post(text, max_tokens, overlap=OVERLAP_SENTENCES):
+    """
+    Splits `text` into windows of whole sentences of at most `max_tokens` (a single longer
+    sentence becomes its own window), each window repeating the last `overlap` sentences of
+    the previous one so evidence crossing a boundary is seen whole at least once.
+    """
+    spans = sentence_spans(text)
+    if not spans or estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    chunks = []
+    first = 0
+    while first < len(spans):
+        last = first
+        while last + 1 < len(spans) and estimate_tokens(text[spans[first][0]:spans[last + 1][1]]) <= max_tokens:
+            last += 1
+        chunks.append(text[spans[first][0]:spans[last][1]].strip())
+        if last + 1 >= len(spans):
+            break
+        first = max(last + 1 - overlap, first + 1)
+    return chunks
+
+
+def merge_spans(spans, post_text):
+    """ Deduplicates spans across chunks, dropping ones contained in a longer span, in post order. """
+    unique = {}
+    for span in spans:
+        if isinstance(span, str) and span.strip():
+            unique.setdefault(" ".join(span.split()).lower(), span.strip())
+    keys = sorted(unique, key=len, reverse=True)
+    kept = [k for i, k in enumerate(keys) if not any(k in longer for longer in keys[:i])]
+
+    def position(key):
+        found = post_text.find(unique[key])
+        return found if found >= 0 else len(post_text)
+
+    return [unique[k] for k in sorted(kept, key=position)]
+
+
+def extract_evidence_chunked(post_text, extract_fn, model, workers=CHUNK_WORKERS):
+    """ Runs `extract_fn` over the post's windows concurrently and merges the evidence lists. """
+    chunks = chunk_post(post_text, chunk_budget(model))
+    if len(chunks) == 1:
+        return extract_fn(post_text)
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        results = list(executor.map(extract_fn, chunks))
+
+    return {
+        key: merge_spans([span for r in results for span in (r.get(key) or [])], post_text)
+        for key in ("adaptive_evidence", "maladaptive_evidence")
+    }
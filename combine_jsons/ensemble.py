@@ -0,0 +1,87 @@
+import json
+import pandas as pd
+
+from combine_jsons.submission_store import (EVIDENCE_TASKS, POST_SUMMARY_TASK, SCORE_TASK, TIMELINE_SUMMARY_TASK,
+                                            load_store)
+
+# Constants
+STORE_DIR = "submission_store"
+MODELS = ['llama2', 'llama3.1', 'llama3.2', 'mistral', 'gemma2']
+SCORE_METHOD = "mean"  # "mean", "median" or "vote"
+EVIDENCE_METHOD = "majority"  # "union", "intersection" or "majority"
+SUMMARY_PREFERENCE = ['gemma2', 'llama3.1', 'mistral', 'llama3.2', 'llama2']
+output_file = "ensemble_submission.json"
+
+KEY = ["timeline_id", "post_id"]
+
+
+def ensemble_scores(df, method=SCORE_METHOD):
+    """ Combines well-being scores across models per post. """
+    scores = df[df.task == SCORE_TASK].assign(score=lambda d: pd.to_numeric(d.value, errors="coerce"))
+    scores = scores.dropna(subset=["score"])
+    if method == "vote":
+        counts = scores.groupby(KEY + ["score"]).size().rename("votes").reset_index()
+        # ties go to the lower (more conservative) score
+        counts = counts.sort_values(KEY + ["votes", "score"], ascending=[True, True, False, True])
+        return counts.drop_duplicates(KEY).set_index(KEY).score.round().astype(int)
+    return scores.groupby(KEY).score.agg(method).round().astype(int)
+
+
+def ensemble_evidence(df, method=EVIDENCE_METHOD):
+    """ Keeps evidence spans produced by enough models: any (union), all (intersection) or most (majority). """
+    evidence = df[df.task.isin(EVIDENCE_TASKS)].assign(span=lambda d: d.value.str.strip())
+    evidence = evidence[evidence.span != ""].drop_duplicates(["model"] + KEY + ["task", "span"])
+    votes = evidence.groupby(KEY + ["task", "span"]).model.nunique().rename("votes").reset_index()
+
+    # models that produced output for the post, so absent models don't count against a span
+    voters = df[df.post_id != ""].groupby(KEY).model.nunique().rename("voters").reset_index()
+    votes = votes.merge(voters, on=KEY)
+    if method == "union":
+        keep = votes.votes >= 1
+    elif method == "intersection":
+        keep = votes.votes == votes.voters
+    else:
+        keep = votes.votes * 2 > votes.voters
+    return votes[keep]
+
+
+def pick_summaries(df, preference=SUMMARY_PREFERENCE):
+    """ Takes each non-empty summary from the most preferred model that produced one. """
+    summaries = df[df.task.isin([POST_SUMMARY_TASK, TIMELINE_SUMMARY_TASK]) & (df.value.str.strip() != "")]
+    rank = {model: i for i, model in enumerate(preference)}
+    summaries = summaries.assign(rank=summaries.model.map(rank).fillna(len(rank)))
+    return summaries.sort_values("rank").drop_duplicates(KEY + ["task"])
+
+
+def export_submission(df, file_path, score_method=SCORE_METHOD, evidence_method=EVIDENCE_METHOD):
+    """ Builds the official nested submission JSON from the ensembled table. """
+    scores = ensemble_scores(df, score_method)
+    evidence = ensemble_evidence(df, evidence_method)
+    summaries = pick_summaries(df)
+
+    submission = {}
+    for timeline_id, post_id in df[KEY].drop_duplicates().itertuples(index=False):
+        timeline = submission.setdefault(timeline_id, {"timeline_level": {"summary": ""}, "post_level": {}})
+        if post_id:
+            timeline["post_level"][post_id] = {"adaptive_evidence": [], "maladaptive_evidence": [],
+                                               "summary": "", "well-being score": None}
+
+    for (timeline_id, post_id), score in scores.items():
+        submission[timeline_id]["post_level"][post_id]["well-being score"] = int(score)
+    for timeline_id, post_id, task, span in evidence[KEY + ["task", "span"]].itertuples(index=False):
+        submission[timeline_id]["post_level"][post_id][task].append(span)
+    for timeline_id, post_id, task, value in summaries[KEY + ["task", "value"]].itertuples(index=False):
+        if task == TIMELINE_SUMMARY_TASK:
+            submission[timeline_id]["timeline_level"]["summary"] = value
+        else:
+            submission[timeline_id]["post_level"][post_id]["summary"] = value
+
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(submission, f, indent=4, ensure_ascii=False)
+    return submission
+
+
+if __name__ == "__main__":
+    results_df = load_store(STORE_DIR, models=MODELS)
+    export_submission(results_df, output_file)
+    print(f"Ensemble file saved as {output_file}")
@@ -0,0 +1,65 @@
+import json
+import os
+import re
+import pandas as pd
+
+# One row per (model, timeline_id, post_id, task, value); evidence lists are exploded to one span per row.
+# Timeline-level rows use an empty post_id. Values are stored as strings so one Parquet schema fits every task.
+COLUMNS = ["model", "timeline_id", "post_id", "task", "value"]
+EVIDENCE_TASKS = ["adaptive_evidence", "maladaptive_evidence"]
+SCORE_TASK = "well-being score"
+POST_SUMMARY_TASK = "summary"
+TIMELINE_SUMMARY_TASK = "timeline_summary"
+
+
+def submission_to_frame(model, submission):
+    """ Flattens a nested {timeline_id: {timeline_level, post_level}} submission into store rows. """
+    rows = []
+    for timeline_id, timeline in submission.items():
+        summary = timeline.get("timeline_level", {}).get("summary", "")
+        rows.append((model, timeline_id, "", TIMELINE_SUMMARY_TASK, str(summary)))
+        for post_id, post in timeline.get("post_level", {}).items():
+            rows.append((model, timeline_id, post_id, POST_SUMMARY_TASK, str(post.get("summary", ""))))
+            if post.get(SCORE_TASK) is not None:
+                rows.append((model, timeline_id, post_id, SCORE_TASK, str(post[SCORE_TASK])))
+            for task in EVIDENCE_TASKS:
+                for span in post.get(task) or []:
+                    rows.append((model, timeline_id, post_id, task, span if isinstance(span, str) else json.dumps(span)))
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def append_submission(store_dir, model, submission):
+    """
+    Adds one model's submission to the store as `{model}.parquet`, replacing that model's
+    previous run so re-running a sweep never counts its rows twice in the ensemble.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    frame = submission_to_frame(model, submission)
+    part_path = os.path.join(store_dir, f"{model}.parquet")
+    # dot-prefixed files are skipped by the Parquet dataset reader, so readers never see a partial part
+    tmp_path = os.path.join(store_dir, f".{model}.parquet.tmp")
+    frame.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, part_path)
+
+    # timestamped parts written by earlier versions of the store
+    legacy = re.compile(re.escape(model) + r"-\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}-\d+\.parquet")
+    for name in os.listdir(store_dir):
+        if legacy.fullmatch(name):
+            os.remove(os.path.join(store_dir, name))
+    return part_path
+
+
+def import_submission_json(store_dir, file_path, model):
+    """ Loads an existing `{model}_..._submission.json` file into the store. """
+    with open(file_path, "r", encoding="utf-8") as f:
+        return append_submission(store_dir, model, json.load(f))
+
+
+def load_store(store_dir, models=None, tasks=None):
+    """ Reads the store as one DataFrame, pushing model/task filters down to the Parquet reader. """
+    filters = []
+    if models:
+        filters.append(("model", "in", list(models)))
+    if tasks:
+        filters.append(("task", "in", list(tasks)))
+    return pd.read_parquet(store_dir, columns=COLUMNS, filters=filters or None)
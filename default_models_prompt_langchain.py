@@ -11,6 +11,10 @@ models = ['llama2', 'llama3.1', 'llama3.2', 'mistral', 'gemma2']
 FOLDER_PATH = "test-clpsych2025"
 folder_name = "default_prompt_langchain_test"
 os.makedirs(folder_name, exist_ok=True)
+SUBMISSION_STORE = None  # e.g. "submission_store" to also append results to the Parquet store
+# Dry run: estimate calls, tokens and wall time of the sweep from the prompt templates without contacting Ollama
+DRY_RUN = False
+TELEMETRY_PATH = None  # telemetry.jsonl written by the requests-based scripts, for measured throughput
 
 
 # Function to read JSON files
@@ -137,6 +141,23 @@ summarize_timeline_template = create_prompt_template(
     """
 )
 
+def render_prompts(timeline):
+    """ Formats every prompt one timeline needs with the real templates. """
+    prompts = []
+    for post in timeline["posts"]:
+        prompts.append(("extract_evidence", extract_evidence_template.format(post_text=post["post"])))
+        prompts.append(("predict_wellbeing", predict_wellbeing_template.format(post_text=post["post"])))
+        prompts.append(("summarize_post", summarize_post_template.format(post_text=post["post"])))
+    all_posts = "\n\n".join(post["post"] for post in timeline["posts"])
+    prompts.append(("summarize_timeline", summarize_timeline_template.format(post_text=all_posts)))
+    return prompts
+
+
+if DRY_RUN:
+    from planner import plan_sweep
+    plan_sweep(models, timelines, render_prompts, TELEMETRY_PATH)
+    raise SystemExit
+
 # Main Processing Loop
 for model in models:
     submission_output = {}
@@ -187,4 +208,8 @@ for model in models:
     with open(file_path, "w", encoding="utf-8") as f:
         json.dump(submission_output, f, indent=4, ensure_ascii=False)
 
+    if SUBMISSION_STORE:
+        from combine_jsons.submission_store import append_submission
+        append_submission(SUBMISSION_STORE, model, submission_output)
+
     print(f"Submission file saved as {file_path}")
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+
+
+def fingerprint(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def timeline_fingerprint(post_fingerprints):
+    return fingerprint("|".join(f"{post_id}:{fp}" for post_id, fp in post_fingerprints))
+
+
+def load_state(path, config_key):
+    """
+    Loads the per-timeline outputs of the previous run. The state is discarded when
+    `config_key` (a fingerprint of the prompts/settings that produced it) has changed.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            state = json.load(f)
+        except json.JSONDecodeError:
+            print(f"Error reading {path}, running a full pass")
+            return {}
+    if state.get("config_key") != config_key:
+        print("Prompts or settings changed since the last run, running a full pass")
+        return {}
+    return state.get("timelines", {})
+
+
+def save_state(path, config_key, timelines_state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"config_key": config_key, "timelines": timelines_state}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def plan_timeline(timeline, prior):
+    """
+    Works out what must be recomputed for one timeline:
+      - "reuse": {post_id: previous post-level output} for posts whose text is unchanged
+      - "summary": "reuse" when nothing changed, "incremental" when posts were only appended
+        to an otherwise unchanged timeline, "full" otherwise
+      - "new_post_ids": the appended posts an incremental summary has to fold in
+    """
+    post_fps = [(post["post_id"], fingerprint(post["post"])) for post in timeline["posts"]]
+    plan = {
+        "post_fingerprints": post_fps,
+        "fingerprint": timeline_fingerprint(post_fps),
+        "reuse": {},
+        "summary": "full",
+        "prior_summary": "",
+        "new_post_ids": [],
+    }
+    if not prior:
+        return plan
+
+    prior_posts = prior.get("posts", {})
+    for post_id, fp in post_fps:
+        if post_id in prior_posts and prior_posts[post_id]["fingerprint"] == fp:
+            plan["reuse"][post_id] = prior_posts[post_id]["output"]
+
+    prior_order = prior.get("post_order", [])
+    order = [post_id for post_id, _ in post_fps]
+    if not prior.get("summary"):
+        pass  # the previous summary failed, so it is rebuilt in full
+    elif prior.get("fingerprint") == plan["fingerprint"]:
+        plan["summary"] = "reuse"
+    elif order[:len(prior_order)] == prior_order and all(post_id in plan["reuse"] for post_id in prior_order):
+        plan["summary"] = "incremental"
+        plan["new_post_ids"] = order[len(prior_order):]
+    plan["prior_summary"] = prior.get("summary", "")
+    return plan
+
+
+def record_timeline(plan, post_outputs, summary, failed_post_ids=()):
+    """
+    State entry for a processed timeline, used as `prior` on the next run. Posts with a failed
+    LLM call are left out, and the summary is only kept when it and every post succeeded, so the
+    next run recomputes them instead of reusing defaults.
+    """
+    return {
+        "fingerprint": plan["fingerprint"],
+        "post_order": [post_id for post_id, _ in plan["post_fingerprints"]],
+        "posts": {post_id: {"fingerprint": fp, "output": post_outputs[post_id]}
+                  for post_id, fp in plan["post_fingerprints"]
+                  if post_id in post_outputs and post_id not in failed_post_ids},
+        "summary": summary if not failed_post_ids else "",
+    }
+
+
+def delta_report(plans):
+    posts = sum(len(p["post_fingerprints"]) for p in plans)
+    reused = sum(len(p["reuse"]) for p in plans)
+    summaries = {action: sum(1 for p in plans if p["summary"] == action) for action in ("reuse", "incremental", "full")}
+    print(f"Delta: {posts - reused}/{posts} posts processed, {reused} reused; timeline summaries "
+          f"{summaries['reuse']} reused, {summaries['incremental']} incremental, {summaries['full']} full")
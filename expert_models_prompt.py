@@ -10,6 +10,49 @@ global OLLAMA_MODEL
 FOLDER_PATH = "test-clpsych2025"
 folder_name = "expert_prompt_test"
 os.makedirs(folder_name, exist_ok=True)
+SUBMISSION_STORE = None  # e.g. "submission_store" to also append results to the Parquet store
+
+# Cascade: score sentences with the ml_approach TF-IDF classifiers and only send
+# posts with likely self-state content to the LLM for evidence extraction
+CASCADE_MODE = False
+CASCADE_REFERENCE = None  # optional full-run submission JSON to measure recall lost
+
+# Score posts with the TF-IDF well-being model and only ask the LLM when it is unsure
+WELLBEING_GATED = False
+WELLBEING_TRAIN_FOLDER = "train-clpsych2025-v1"  # annotated timelines held out from FOLDER_PATH
+
+# Hedged requests: duplicate slow calls to another Ollama instance and keep the first answer
+HEDGING = False
+OLLAMA_ENDPOINTS = [OLLAMA_IP]  # e.g. ["http://host-a:11434", "http://host-b:11434"]
+
+# Split posts longer than the model context into overlapping windows extracted concurrently
+CHUNKED_EVIDENCE = False
+
+# Delta mode: only re-run post tasks for new/changed posts and update timeline summaries incrementally
+DELTA_MODE = False
+
+# Work queue shared by several machines: run once with QUEUE_ROLE = "enqueue", then "work" on every
+# machine (each with its own OLLAMA_IP), then "collect" to write the submission files
+QUEUE_PATH = None  # e.g. "/mnt/shared/sweep_queue.db"
+QUEUE_ROLE = "work"
+
+# Dry run: estimate calls, tokens and wall time of the sweep from the real prompts without contacting Ollama
+DRY_RUN = False
+TELEMETRY_PATH = os.path.join(folder_name, "telemetry.jsonl")  # per-call timings used by the dry-run planner
+dry_run_prompts = []
+failed_calls = []  # task of every call that still failed after its retries
+
+# Normalize posts before prompting (whitespace, URLs, markdown, repeated lines); evidence is mapped back
+# to the original text. TRIM_TOKENS additionally trims the score and summary prompts to salient sentences.
+NORMALIZE_POSTS = False
+TRIM_TOKENS = None  # e.g. 400
+
+# Score several posts of a timeline per prompt, sharing the rubric (takes precedence over WELLBEING_GATED)
+WELLBEING_BATCH = False
+
+# Model residency: preload each model before its jobs, keep it loaded with an explicit keep_alive
+# and unload it after, so weights are loaded once per model per sweep (see residency.py)
+RESIDENCY = False
 
 # Function to read JSON files
 def read_json_files(folder):
@@ -28,23 +71,49 @@ def read_json_files(folder):
 # Load Data
 timelines = read_json_files(FOLDER_PATH)
 
+if HEDGING:
+    from hedging import HedgedClient
+    hedged_client = HedgedClient(OLLAMA_ENDPOINTS)
+
+if RESIDENCY and not DRY_RUN:
+    from residency import ResidencyManager
+    residency = ResidencyManager(OLLAMA_ENDPOINTS if HEDGING else [OLLAMA_IP], telemetry_path=TELEMETRY_PATH)
+
 
-def query_ollama(prompt, max_retries=5, retry_delay=2):
+def query_ollama(prompt, max_retries=5, retry_delay=2, task="default"):
     """ Sends a request to Ollama API and ensures complete response with error handling. """
+    if DRY_RUN:
+        dry_run_prompts.append((task, prompt))
+        return {}
+
+    payload = {"model": OLLAMA_MODEL, "prompt": prompt, "format": "json"}
+    if RESIDENCY:
+        payload["keep_alive"] = residency.keep_alive
+
     for attempt in range(max_retries):
         try:
-            response = requests.post(
-                f"{OLLAMA_IP}/api/generate",
-                json={"model": OLLAMA_MODEL, "prompt": prompt, "format": "json", "stream": False},
-                headers={"Content-Type": "application/json"},
-                timeout=30  # Avoid indefinite hanging
-            )
-            response.raise_for_status()  # Raise an error for bad responses (e.g., 500, 404)
-
-            response_json = response.json()
+            if HEDGING:
+                response_json = hedged_client.generate(payload, task=task, timeout=30)
+            else:
+                response = requests.post(
+                    f"{OLLAMA_IP}/api/generate",
+                    json=dict(payload, stream=False),
+                    headers={"Content-Type": "application/json"},
+                    timeout=30  # Avoid indefinite hanging
+                )
+                response.raise_for_status()  # Raise an error for bad responses (e.g., 500, 404)
+
+                response_json = response.json()
 
             raw_response = response_json.get("response", "")
 
+            if RESIDENCY:
+                residency.observe(OLLAMA_MODEL, response_json)
+
+            if TELEMETRY_PATH:
+                from planner import record_telemetry
+                record_telemetry(TELEMETRY_PATH, OLLAMA_MODEL, task, response_json)
+
             try:
                 parsed_response = json.loads(raw_response)
                 return parsed_response  # Successfully parsed response
@@ -58,6 +127,7 @@ def query_ollama(prompt, max_retries=5, retry_delay=2):
             time.sleep(retry_delay)
 
     print("Max retries reached. Returning empty result.")
+    failed_calls.append(task)
     return {}
 
 def extract_evidence(post_text):
@@ -78,7 +148,7 @@ def extract_evidence(post_text):
       "maladaptive_evidence": [<text spans that show maladaptive self-states>]
     }}
     """
-    return query_ollama(prompt)
+    return query_ollama(prompt, task="extract_evidence")
 
 
 def predict_wellbeing(post_text):
@@ -104,7 +174,35 @@ def predict_wellbeing(post_text):
     **Response format (strict JSON):**
     {{ "wellbeing_score": <integer between 1 and 10> }}
     """
-    return query_ollama(prompt)
+    return query_ollama(prompt, task="predict_wellbeing")
+
+
+def predict_wellbeing_batch(posts):
+    print('predict_wellbeing_batch')
+    """ Predicts well-being scores for several posts of one timeline in a single prompt. """
+    posts_text = "\n\n".join(f"[post_id: {post_id}]\n\"{post_text}\"" for post_id, post_text in posts.items())
+
+    prompt = f"""
+    You are a clinical expert in **mental health assessment**. Your task is to assign a **well-being score (1-10)** to each Reddit post below based on its emotional, cognitive, and behavioral indicators. Score every post independently.
+
+    - **1**: The person is in persistent danger of severely hurting self or others or persistent inability to maintain minimal personal hygiene or has attempted a serious suicidal act with a clear expectation of death.
+    - **2**: In danger of hurting self or others (eg., suicide attempts; frequently violent; manic excitement) or may fail to maintain minimal personal hygiene or significant impairment in communication (e.g., incoherent or mute).
+    - **3**: A person experiences delusions or hallucinations or serious impairment in communication or judgment or is unable to function in almost all areas (eg., no job, home, or friends).
+    - **4**: Some impairment in reality testing or communication, or major impairment in multiple areas (withdrawal from social ties, inability to work, neglecting family, severe mood/thought impairment).
+    - **5**: Serious symptoms (e.g., suicidal thoughts, severe compulsions) or serious impairment in social, occupational, or school functioning (eg., no friends, inability to keep a job).
+    - **6**: Moderate symptoms (eg., panic attacks) or moderate difficulty in social, occupational or school functioning.
+    - **7**: Mild symptoms (eg., depressed mood and mild insomnia) or some difficulty in social, occupational, or school functioning, but generally functioning well, has some meaningful interpersonal relationships.
+    - **8**: If symptoms are present, they are temporary and expected reactions to psychosocial stressors (eg., difficulty concentrating after family argument). Slight impairment in social, occupational or school functioning.
+    - **9**: Absent or minimal symptoms (eg., mild anxiety before an exam), good functioning in all areas, interested and involved in a wide range of activities.
+    - **10**: No symptoms and superior functioning in a wide range of activities.
+    **Posts:**
+    {posts_text}
+
+    **Response format (strict JSON, one entry per post_id):**
+    {{ "scores": {{ "<post_id>": <integer between 1 and 10> }} }}
+    """
+
+    return query_ollama(prompt, task="predict_wellbeing_batch")
 
 
 def summarize_post(post_text):
@@ -123,7 +221,7 @@ def summarize_post(post_text):
     **Response format (strict JSON):**
     {{ "summary": "<concise analysis of self-states in the post>" }}
     """
-    return query_ollama(prompt)
+    return query_ollama(prompt, task="summarize_post")
 
 
 def summarize_timeline(posts):
@@ -145,34 +243,230 @@ def summarize_timeline(posts):
     **Response format (strict JSON):**
     {{ "summary": "<timeline-level psychological summary>" }}
     """
-    return query_ollama(prompt)
+    return query_ollama(prompt, task="summarize_timeline")
 
 
-for model in models:
+def update_timeline_summary(prior_summary, new_posts):
+    print('update_timeline_summary')
+    """ Folds newly added posts into an existing timeline-level summary. """
+    new_text = "\n\n".join(new_posts)
+
+    prompt = f"""
+    You are a **clinical psychologist analyzing mental health trends over time**. Below is your existing summary of a single user's **self-state trajectory**, followed by analyses of their newest Reddit posts.
+    Update the summary so it covers the whole timeline including the new posts.
+
+    - Keep the **patterns of emotional and cognitive change** already identified unless the new posts contradict them.
+    - Note **shifts between adaptive and maladaptive self-states** introduced by the new posts.
+    - Highlight **any signs of improvement, deterioration, or instability**.
+
+    **Existing summary:**
+    \"{prior_summary}\"
+
+    **New posts:**
+    \"{new_text}\"
+
+    **Response format (strict JSON):**
+    {{ "summary": "<timeline-level psychological summary>" }}
+    """
+
+    return query_ollama(prompt, task="update_timeline_summary")
+
+
+def extract_evidence_long(post_text):
+    """ Extracts evidence from overlapping windows of a long post concurrently and merges the spans. """
+    from chunking import extract_evidence_chunked
+    return extract_evidence_chunked(post_text, extract_evidence, OLLAMA_MODEL)
+
+
+evidence_fn = extract_evidence_long if CHUNKED_EVIDENCE else extract_evidence
+
+
+def render_prompts(timeline):
+    """
+    Builds the prompts one timeline needs by running the task functions with DRY_RUN capturing them,
+    following CHUNKED_EVIDENCE, NORMALIZE_POSTS/TRIM_TOKENS and WELLBEING_BATCH (assuming no retries).
+    """
+    import contextlib
+    import io
+    dry_run_prompts.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        texts = {post["post_id"]: (post["post"], post["post"]) for post in timeline["posts"]}
+        if NORMALIZE_POSTS:
+            from normalize import normalize_post, trim_extractive
+            for post_id, (text, _) in texts.items():
+                prompt_text = normalize_post(text)[0]
+                texts[post_id] = (prompt_text, trim_extractive(prompt_text, TRIM_TOKENS) if TRIM_TOKENS else prompt_text)
+
+        if WELLBEING_BATCH:
+            from batching import pack_batches
+            for batch in pack_batches({post_id: score_text for post_id, (_, score_text) in texts.items()}):
+                if len(batch) == 1:
+                    predict_wellbeing(next(iter(batch.values())))
+                else:
+                    predict_wellbeing_batch(batch)
+        for prompt_text, score_text in texts.values():
+            evidence_fn(prompt_text)
+            if not WELLBEING_BATCH:
+                predict_wellbeing(score_text)
+            summarize_post(score_text)
+        summarize_timeline([score_text for _, score_text in texts.values()])
+    return list(dry_run_prompts)
+
+
+if DRY_RUN:
+    from planner import plan_sweep
+    # these modes skip calls based on trained models or earlier runs, so the estimate is an upper bound
+    ignored = [name for name, enabled in [("CASCADE_MODE", CASCADE_MODE), ("WELLBEING_GATED", WELLBEING_GATED),
+                                          ("DELTA_MODE", DELTA_MODE)] if enabled]
+    if ignored:
+        print(f"Dry run ignores {', '.join(ignored)}: estimates assume every post is sent to the LLM")
+    OLLAMA_MODEL = models[0]  # chunk sizes follow this model's context window
+    plan_sweep(models, timelines, render_prompts, TELEMETRY_PATH)
+    raise SystemExit
+
+if CASCADE_MODE:
+    from ml_approach.cascade import build_cascade, extract_evidence_cascaded, cascade_report
+    cascade = build_cascade()
+
+if WELLBEING_GATED:
+    if not WELLBEING_TRAIN_FOLDER or os.path.abspath(WELLBEING_TRAIN_FOLDER) == os.path.abspath(FOLDER_PATH):
+        # a gate trained on the posts it scores is overconfident and never falls back to the LLM
+        raise ValueError("WELLBEING_GATED needs WELLBEING_TRAIN_FOLDER set to an annotated folder other than FOLDER_PATH")
+    from ml_approach.wellbeing_regressor import load_scored_posts, train_wellbeing_model, predict_wellbeing_gated
+    wellbeing_vectorizer, wellbeing_model = train_wellbeing_model(*load_scored_posts(WELLBEING_TRAIN_FOLDER))
+
+
+def use_model(model):
+    global OLLAMA_MODEL
     OLLAMA_MODEL = model
+    if RESIDENCY:
+        residency.acquire(model)
+
+
+if QUEUE_PATH:
+    # queue jobs run the plain per-post tasks; these modes need the in-process sweep loop
+    unsupported = [name for name, enabled in [("CASCADE_MODE", CASCADE_MODE), ("WELLBEING_GATED", WELLBEING_GATED),
+                                              ("WELLBEING_BATCH", WELLBEING_BATCH), ("NORMALIZE_POSTS", NORMALIZE_POSTS),
+                                              ("DELTA_MODE", DELTA_MODE)] if enabled]
+    if unsupported:
+        raise ValueError(f"QUEUE_PATH cannot be combined with {', '.join(unsupported)}")
+    import work_queue
+    if QUEUE_ROLE == "enqueue":
+        print(f"Enqueued {work_queue.enqueue_sweep(work_queue.connect(QUEUE_PATH), models, timelines)} jobs")
+    elif QUEUE_ROLE == "work":
+        work_queue.run_worker(QUEUE_PATH, {
+            "extract_evidence": evidence_fn,
+            "predict_wellbeing": predict_wellbeing,
+            "summarize_post": summarize_post,
+            "summarize_timeline": summarize_timeline,
+        }, use_model)
+        if CHUNKED_EVIDENCE or TRIM_TOKENS:
+            from segmenter import save_default_cache
+            save_default_cache()
+        if RESIDENCY:
+            residency.release()
+            residency.report()
+    elif QUEUE_ROLE == "collect":
+        for model in models:
+            file_path = os.path.join(folder_name, f"{model}_begin_submission.json")
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(work_queue.collect_submission(QUEUE_PATH, model), f, indent=4, ensure_ascii=False)
+            print(f"Submission file saved as {file_path}")
+    raise SystemExit
+
+for model in models:
+    use_model(model)
 
     submission_output = {}
+    cascade_decisions = []
+    wellbeing_stats = {}
+
+    if NORMALIZE_POSTS:
+        from normalize import TokenLedger, map_span_to_original, normalize_post, trim_extractive
+        token_ledger = TokenLedger()
+
+    if WELLBEING_BATCH:
+        from batching import score_posts_batched
+        batch_stats = {}
+
+    if DELTA_MODE:
+        from delta import fingerprint, load_state, save_state, plan_timeline, record_timeline, delta_report
+        with open(__file__, "r", encoding="utf-8") as f:
+            delta_key = fingerprint(f.read())  # any prompt or setting change invalidates the saved outputs
+        delta_path = os.path.join(folder_name, f"{OLLAMA_MODEL}_delta_state.json")
+        delta_state = load_state(delta_path, delta_key)
+        new_delta_state = {}
+        delta_plans = []
 
     for timeline in timelines:
         timeline_id = timeline["timeline_id"]
         submission_output[timeline_id] = {"timeline_level": {}, "post_level": {}}
 
+        plan = None
+        failed_post_ids = set()
+        if DELTA_MODE:
+            plan = plan_timeline(timeline, delta_state.get(timeline_id))
+            delta_plans.append(plan)
+
         all_posts = []
 
+        batch_scores = {}
+        if WELLBEING_BATCH:
+            pending = {post["post_id"]: post["post"] for post in timeline["posts"]
+                       if not (plan and post["post_id"] in plan["reuse"])}
+            if NORMALIZE_POSTS:
+                pending = {post_id: normalize_post(text)[0] for post_id, text in pending.items()}
+                if TRIM_TOKENS:
+                    pending = {post_id: trim_extractive(text, TRIM_TOKENS) for post_id, text in pending.items()}
+            batch_scores = score_posts_batched(pending, predict_wellbeing_batch, predict_wellbeing, batch_stats)
+            failed_post_ids.update(post_id for post_id in pending if post_id not in batch_scores)
+
         for post in timeline["posts"]:
             post_id = post["post_id"]
             post_text = post["post"]
 
+            prompt_text = score_text = post_text
+            if NORMALIZE_POSTS:
+                prompt_text, index_map = normalize_post(post_text)
+                score_text = trim_extractive(prompt_text, TRIM_TOKENS) if TRIM_TOKENS else prompt_text
+
+            if plan and post_id in plan["reuse"]:
+                submission_output[timeline_id]["post_level"][post_id] = plan["reuse"][post_id]
+                all_posts.append(score_text)
+                continue
+
+            if NORMALIZE_POSTS:
+                saved = token_ledger.add(post_text, [prompt_text, score_text, score_text, score_text])
+                print(f"tokens saved: {saved}")
+            failures_before = len(failed_calls)
+
             # Extract evidence
-            evidence = extract_evidence(post_text)
+            if CASCADE_MODE:
+                evidence = extract_evidence_cascaded(cascade, prompt_text, evidence_fn, cascade_decisions,
+                                                     key=(timeline_id, post_id))
+            else:
+                evidence = evidence_fn(prompt_text)
             adaptive_evidence = evidence.get("adaptive_evidence", [])
             maladaptive_evidence = evidence.get("maladaptive_evidence", [])
+            if NORMALIZE_POSTS:
+                adaptive_evidence = [map_span_to_original(s, prompt_text, index_map, post_text) for s in adaptive_evidence]
+                maladaptive_evidence = [map_span_to_original(s, prompt_text, index_map, post_text)
+                                        for s in maladaptive_evidence]
 
             # Predict well-being score
-            wellbeing_score = predict_wellbeing(post_text).get("wellbeing_score", 5)  # Default 5 if missing
+            if WELLBEING_BATCH:
+                wellbeing = {"wellbeing_score": batch_scores.get(post_id, 5)}
+            elif WELLBEING_GATED:
+                wellbeing = predict_wellbeing_gated(wellbeing_vectorizer, wellbeing_model, score_text,
+                                                    predict_wellbeing, wellbeing_stats)
+            else:
+                wellbeing = predict_wellbeing(score_text)
+            wellbeing_score = wellbeing.get("wellbeing_score", 5)  # Default 5 if missing
 
             # Generate post summary
-            post_summary = summarize_post(post_text).get("summary", "")
+            post_summary = summarize_post(score_text).get("summary", "")
+            if len(failed_calls) > failures_before:
+                failed_post_ids.add(post_id)
 
             # Store post-level results
             submission_output[timeline_id]["post_level"][post_id] = {
@@ -182,15 +476,60 @@ for model in models:
                 "well-being score": wellbeing_score
             }
 
-            all_posts.append(post_text)
+            all_posts.append(score_text)
 
         # Generate timeline summary
-        timeline_summary = summarize_timeline(all_posts).get("summary", "")
+        if plan and plan["summary"] == "reuse":
+            timeline_summary = plan["prior_summary"]
+        elif plan and plan["summary"] == "incremental":
+            post_level = submission_output[timeline_id]["post_level"]
+            new_posts = [f"{post_level[post_id]['summary']} (well-being score: {post_level[post_id]['well-being score']})"
+                         for post_id in plan["new_post_ids"]]
+            timeline_summary = update_timeline_summary(plan["prior_summary"], new_posts).get("summary", "")
+        else:
+            timeline_summary = summarize_timeline(all_posts).get("summary", "")
         submission_output[timeline_id]["timeline_level"]["summary"] = timeline_summary
 
+        if DELTA_MODE:
+            new_delta_state[timeline_id] = record_timeline(
+                plan, submission_output[timeline_id]["post_level"], timeline_summary, failed_post_ids)
+
     # Save to JSON file
     file_path = os.path.join(folder_name, f"{OLLAMA_MODEL}_begin_submission.json")
     with open(file_path, "w", encoding="utf-8") as f:
         json.dump(submission_output, f, indent=4, ensure_ascii=False)
 
+    if SUBMISSION_STORE:
+        from combine_jsons.submission_store import append_submission
+        append_submission(SUBMISSION_STORE, OLLAMA_MODEL, submission_output)
+
     print(f"Submission file saved as {file_path}")
+
+    if CASCADE_MODE:
+        cascade_report(cascade_decisions, CASCADE_REFERENCE)
+
+    if WELLBEING_GATED:
+        print(f"Well-being scores: {wellbeing_stats.get('model', 0)} from model, {wellbeing_stats.get('llm', 0)} from LLM")
+
+    if HEDGING:
+        hedged_client.report()
+
+    if NORMALIZE_POSTS:
+        token_ledger.report()
+
+    if WELLBEING_BATCH:
+        print(f"Well-being batching: {batch_stats.get('batched', 0)} batch prompts, "
+              f"{batch_stats.get('single', 0)} single-post prompts, {batch_stats.get('retried_posts', 0)} posts retried")
+
+    if DELTA_MODE:
+        save_state(delta_path, delta_key, new_delta_state)
+        delta_report(delta_plans)
+
+    if CASCADE_MODE or CHUNKED_EVIDENCE or TRIM_TOKENS:
+        # sentence spans computed by the cascade, chunker and trimmer, reused by later runs and xgb_lr.py
+        from segmenter import save_default_cache
+        save_default_cache()
+
+if RESIDENCY:
+    residency.release()
+    residency.report()
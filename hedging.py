@@ -0,0 +1,173 @@
+import http.client
+import itertools
+import json
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+import numpy as np
+import requests
+
+# Hedge once a call has run longer than this percentile of recent latencies for the same task
+HEDGE_PERCENTILE = 95
+# Extra requests allowed, as a fraction of all calls
+HEDGE_BUDGET = 0.1
+# Latencies to observe per task before hedging starts
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 500
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+class Attempt:
+    """
+    One in-flight streamed request. Ollama only sends response headers with the first generated
+    token, so a `requests` response does not exist yet while the prompt is evaluated; the attempt
+    keeps the connection itself and `cancel` shuts its socket down, which ends the request on the
+    server at any stage.
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def attach(self, connection):
+        with self.lock:
+            if self.cancelled.is_set():
+                raise RequestCancelled()
+            self.connection = connection
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled.set()
+            if self.connection is not None and self.connection.sock is not None:
+                try:
+                    self.connection.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+class HedgedClient:
+    """
+    Sends Ollama /api/generate requests to a pool of endpoints. When a call outlives the
+    latency percentile of its task, a duplicate goes to the next endpoint and whichever finishes
+    first wins; the loser's streaming connection is closed, which stops generation on that server.
+    """
+
+    def __init__(self, endpoints, percentile=HEDGE_PERCENTILE, budget=HEDGE_BUDGET,
+                 min_samples=HEDGE_MIN_SAMPLES):
+        self.endpoints = list(endpoints)
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.latencies = {}
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.lock = threading.Lock()
+        self.next_endpoint = itertools.cycle(range(len(self.endpoints)))
+        self.executor = ThreadPoolExecutor(max_workers=2 * len(self.endpoints) + 2)
+
+    def threshold(self, task):
+        samples = self.latencies.get(task)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return float(np.percentile(samples, self.percentile))
+
+    def record(self, task, latency):
+        with self.lock:
+            self.latencies.setdefault(task, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    def can_hedge(self):
+        return len(self.endpoints) > 1 and self.hedges < self.budget * self.calls
+
+    def _stream(self, endpoint, payload, timeout, attempt):
+        """
+        Streams one generation, returning it shaped like a non-streamed /api/generate response.
+        Transport and parse errors are raised as `requests` exceptions, which query_ollama retries.
+        """
+        url = urlsplit(endpoint)
+        connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(url.hostname, url.port, timeout=timeout)
+        try:
+            connection.connect()
+            attempt.attach(connection)
+            connection.request("POST", f"{url.path.rstrip('/')}/api/generate", body=json.dumps(dict(payload, stream=True)),
+                               headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            if response.status >= 400:
+                raise requests.exceptions.HTTPError(f"{response.status} {response.reason} from {endpoint}")
+            parts = []
+            for line in response:
+                if attempt.cancelled.is_set():
+                    raise RequestCancelled(endpoint)
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise requests.exceptions.ConnectionError(f"Malformed stream line from {endpoint}: {e}")
+                parts.append(chunk.get("response", ""))
+                if chunk.get("done"):
+                    chunk["response"] = "".join(parts)
+                    chunk["endpoint"] = endpoint
+                    return chunk
+        except (requests.exceptions.RequestException, RequestCancelled):
+            raise
+        except socket.timeout as e:
+            raise requests.exceptions.Timeout(f"{endpoint}: {e}")
+        except (OSError, http.client.HTTPException) as e:
+            if attempt.cancelled.is_set():
+                raise RequestCancelled(endpoint)
+            raise requests.exceptions.ConnectionError(f"{endpoint}: {e}")
+        finally:
+            connection.close()
+        raise requests.exceptions.ConnectionError(f"Stream from {endpoint} ended early")
+
+    def generate(self, payload, task="default", timeout=30):
+        with self.lock:
+            self.calls += 1
+            primary = next(self.next_endpoint)
+        start = time.perf_counter()
+        attempts = [Attempt()]
+        futures = [self.executor.submit(self._stream, self.endpoints[primary], payload, timeout, attempts[0])]
+
+        threshold = self.threshold(task)
+        done, _ = wait(futures, timeout=threshold)
+        if not done:
+            with self.lock:
+                hedge = self.can_hedge()
+                if hedge:
+                    self.hedges += 1
+            if hedge:
+                backup = self.endpoints[(primary + 1) % len(self.endpoints)]
+                attempts.append(Attempt())
+                futures.append(self.executor.submit(self._stream, backup, payload, timeout, attempts[1]))
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for attempt in attempts:
+                        attempt.cancel()
+                    self.record(task, time.perf_counter() - start)
+                    if future is not futures[0]:
+                        with self.lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def report(self):
+        print(f"Hedging: {self.hedges} extra requests over {self.calls} calls "
+              f"({100.0 * self.hedges / max(self.calls, 1):.1f}%), {self.hedge_wins} won by the hedge")
+        for task, samples in self.latencies.items():
+            p50, p99 = np.percentile(samples, [50, 99])
+            print(f"  {task}: p50 {p50:.2f}s, p99 {p99:.2f}s over {len(samples)} calls")
@@ -0,0 +1,109 @@
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from ml_approach.profiling import peak_rss_mb, profiler
+from ml_approach.xgb_lr import classify_sentences, extract_sentences, train_adaptive, train_maladaptive
+
+# Constants
+SEED = 1234
+N_TRAIN_PER_CLASS = 600
+N_POSTS = 40
+SENTENCES_PER_POST = 8
+REPEAT = 3
+results_file = "benchmark_results.json"
+BASELINE_PATH = "benchmark_baseline.json"  # copy a results file here to enable regression checks
+TOLERANCE = 0.25  # fail when a benchmark is this much slower than the baseline
+
+ADAPTIVE_WORDS = ["calm", "hopeful", "proud", "supported", "coping", "grateful", "rested", "connected", "managed"]
+MALADAPTIVE_WORDS = ["hopeless", "worthless", "alone", "panic", "exhausted", "ashamed", "numb", "trapped", "angry"]
+NEUTRAL_WORDS = ["today", "work", "week", "friend", "family", "class", "morning", "dinner", "weekend", "talked",
+                 "went", "back", "home", "again", "really", "about", "with", "after", "before", "still"]
+
+
+def make_sentence(rng, state_words):
+    words = rng.sample(NEUTRAL_WORDS, rng.randint(6, 14)) + rng.sample(state_words, rng.randint(1, 3))
+    rng.shuffle(words)
+    return "I " + " ".join(words) + rng.choice([".", "!", "?"])
+
+
+def make_dataset(seed=SEED):
+    """ Fixed synthetic train data (train_data_classified.json layout) and test posts. """
+    rng = random.Random(seed)
+    train_data = {
+        "adaptive-state": [make_sentence(rng, ADAPTIVE_WORDS) for _ in range(N_TRAIN_PER_CLASS)],
+        "maladaptive-state": [make_sentence(rng, MALADAPTIVE_WORDS) for _ in range(N_TRAIN_PER_CLASS)],
+        "neither-state": [make_sentence(rng, NEUTRAL_WORDS) for _ in range(N_TRAIN_PER_CLASS)],
+    }
+    pools = [ADAPTIVE_WORDS, MALADAPTIVE_WORDS, NEUTRAL_WORDS]
+    posts = [" ".join(make_sentence(rng, rng.choice(pools)) for _ in range(SENTENCES_PER_POST))
+             for _ in range(N_POSTS)]
+    return train_data, posts
+
+
+def timed(fn, repeat=REPEAT):
+    times = []
+    result = None
+    for _ in range(repeat):
+        random.seed(SEED)
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return {"min_s": min(times), "median_s": statistics.median(times)}, result
+
+
+def run_benchmarks():
+    train_data, posts = make_dataset()
+    results = {}
+
+    results["train_maladaptive"], (vectorizer_mal, xgb_model_mal) = timed(lambda: train_maladaptive(train_data))
+    results["train_adaptive"], (vectorizer_adapt, lr_model_adapt) = timed(lambda: train_adaptive(train_data))
+
+    results["sentence_split"], sentences = timed(lambda: [extract_sentences(p) for p in posts])
+    n_sentences = sum(len(s) for s in sentences)
+
+    def predict_all():
+        for post_sentences in sentences:
+            classify_sentences(post_sentences, vectorizer_adapt, lr_model_adapt, vectorizer_mal, xgb_model_mal)
+
+    results["classify_sentences"], _ = timed(predict_all)
+    results["classify_sentences"]["sentences_per_s"] = n_sentences / results["classify_sentences"]["median_s"]
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    regressions = []
+    for name, entry in baseline.items():
+        if not isinstance(entry, dict) or name not in results:
+            continue
+        ratio = results[name]["median_s"] / entry["median_s"]
+        status = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        print(f"{name:<22}{entry['median_s']:>10.3f}s ->{results[name]['median_s']:>10.3f}s  x{ratio:.2f}  {status}")
+        if status != "ok":
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    profiler.configure(enabled=True)
+    results = run_benchmarks()
+    profiler.report()
+
+    with open(results_file, "w", encoding="utf8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Benchmark results saved as {results_file}")
+
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r", encoding="utf8") as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print(f"Slower than baseline: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
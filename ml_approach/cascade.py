@@ -0,0 +1,123 @@
+import json
+
+from ml_approach.xgb_lr import extract_sentences, load_train_data, train_classifiers
+
+# Sentences whose adaptive or maladaptive probability reaches this value are sent to the LLM
+CASCADE_THRESHOLD = 0.3
+# "post": send the whole post if any sentence passes; "sentence": send only the passing sentences
+CASCADE_GRANULARITY = "post"
+
+
+def build_cascade(train_path="train_data_classified.json"):
+    """ Trains the TF-IDF sentence classifiers used to prefilter posts before the LLM. """
+    train_data = load_train_data(train_path)
+    vectorizer_adapt, lr_model_adapt, vectorizer_mal, xgb_model_mal = train_classifiers(train_data)
+    return {
+        "vectorizer_adapt": vectorizer_adapt,
+        "lr_model_adapt": lr_model_adapt,
+        "vectorizer_mal": vectorizer_mal,
+        "xgb_model_mal": xgb_model_mal,
+    }
+
+
+def score_sentences(cascade, sentences):
+    """ Returns (p_adaptive, p_maladaptive) for every sentence in a single batched transform. """
+    if not sentences:
+        return []
+    p_adapt = cascade["lr_model_adapt"].predict_proba(cascade["vectorizer_adapt"].transform(sentences))[:, 1]
+    p_mal = cascade["xgb_model_mal"].predict_proba(cascade["vectorizer_mal"].transform(sentences))[:, 1]
+    return list(zip(p_adapt.tolist(), p_mal.tolist()))
+
+
+def prefilter_post(cascade, post_text, threshold=CASCADE_THRESHOLD, granularity=CASCADE_GRANULARITY):
+    """
+    Decides whether a post needs LLM evidence extraction.
+    Returns the text to send to the LLM (None when the post is resolved as empty evidence)
+    and a decision record used by `cascade_report`.
+    """
+    sentences = extract_sentences(post_text)
+    scores = score_sentences(cascade, sentences)
+    kept = [s for s, (p_a, p_m) in zip(sentences, scores) if max(p_a, p_m) >= threshold]
+    if kept and granularity == "post":
+        dropped = []  # the whole post still reaches the LLM
+    else:
+        dropped = [s for s in sentences if s not in kept]
+
+    decision = {
+        "sentences": len(sentences),
+        "kept_sentences": kept,
+        "dropped_sentences": dropped,
+        "sent_to_llm": bool(kept),
+    }
+    if not kept:
+        return None, decision
+    if granularity == "sentence":
+        return " ".join(kept), decision
+    return post_text, decision
+
+
+def extract_evidence_cascaded(cascade, post_text, extract_fn, decisions, threshold=CASCADE_THRESHOLD,
+                              granularity=CASCADE_GRANULARITY, key=None):
+    """
+    Runs `extract_fn` (the script's extract_evidence) only on posts that pass the prefilter.
+    `key` is the post's (timeline_id, post_id), used by `cascade_report` to match reference spans.
+    """
+    llm_text, decision = prefilter_post(cascade, post_text, threshold, granularity)
+    decision["key"] = key
+    decisions.append(decision)
+    if llm_text is None:
+        return {"adaptive_evidence": [], "maladaptive_evidence": []}
+    return extract_fn(llm_text)
+
+
+def squash(text):
+    return " ".join(text.split()).lower()
+
+
+def span_lost(span, decision):
+    """
+    A span is lost when the LLM never saw its post; when only some sentences were dropped, when
+    a dropped sentence contains it (whitespace and case insensitive).
+    """
+    if not decision["sent_to_llm"]:
+        return True
+    span = squash(span)
+    return any(span in squash(sentence) for sentence in decision["dropped_sentences"])
+
+
+def cascade_report(decisions, reference_submission_path=None):
+    """
+    Prints LLM calls saved by the cascade. When a submission from a full (non-cascaded) run is
+    given, recall lost is the share of its evidence spans in posts the cascade did not send to the
+    LLM, or in sentences it dropped from a post sent at sentence granularity.
+    """
+    total = len(decisions)
+    sent = sum(1 for d in decisions if d["sent_to_llm"])
+    saved = total - sent
+    report = {
+        "posts": total,
+        "llm_calls": sent,
+        "llm_calls_saved": saved,
+        "llm_calls_saved_pct": 100.0 * saved / total if total else 0.0,
+        "sentences": sum(d["sentences"] for d in decisions),
+        "sentences_kept": sum(len(d["kept_sentences"]) for d in decisions),
+    }
+
+    if reference_submission_path:
+        with open(reference_submission_path, "r", encoding="utf-8") as f:
+            reference = json.load(f)
+        spans = [((timeline_id, post_id), span)
+                 for timeline_id, timeline in reference.items()
+                 for post_id, post in timeline.get("post_level", {}).items()
+                 for key in ("adaptive_evidence", "maladaptive_evidence")
+                 for span in post.get(key, []) if isinstance(span, str)]
+        # JSON object keys are strings, so ids are compared as strings
+        by_post = {tuple(map(str, d["key"])): d for d in decisions if d.get("key") is not None}
+        lost = sum(1 for key, span in spans if span.strip() and key in by_post and span_lost(span, by_post[key]))
+        report["reference_spans"] = len(spans)
+        report["reference_spans_lost"] = lost
+        report["recall_lost_pct"] = 100.0 * lost / len(spans) if spans else 0.0
+
+    for key, value in report.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+    return report
@@ -0,0 +1,78 @@
+import hashlib
+import os
+import pickle
+import re
+from collections import OrderedDict
+
+MEMO_CAPACITY = 200000
+
+# Same tokens as the default TfidfVectorizer/HashingVectorizer analyzer, so sentences that normalize
+# alike get identical feature vectors and can share a decision
+TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+
+def sentence_key(sentence):
+    normalized = " ".join(TOKEN_RE.findall(sentence.lower()))
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def artifact_version(*artifacts):
+    """ Fingerprint of fitted vectorizers/models; retraining on different data or parameters gives a new version. """
+    digest = hashlib.blake2b(digest_size=12)
+    for artifact in artifacts:
+        if hasattr(artifact, "get_booster"):
+            digest.update(bytes(artifact.get_booster().save_raw()))
+        elif hasattr(artifact, "vocabulary_"):
+            # pickles of fitted vectorizers contain sets, whose order changes between processes
+            digest.update(repr(sorted(artifact.vocabulary_.items())).encode("utf-8"))
+            digest.update(artifact.idf_.tobytes() if hasattr(artifact, "idf_") else b"")
+        elif hasattr(artifact, "coef_"):
+            digest.update(artifact.coef_.tobytes() + artifact.intercept_.tobytes())
+        else:
+            digest.update(pickle.dumps(artifact))
+    return digest.hexdigest()
+
+
+class PredictionMemo:
+    """
+    LRU map from (artifact version, normalized sentence hash) to the classifiers' decisions,
+    persisted between runs. Entries for older artifact versions are never hit again and age out.
+    """
+
+    def __init__(self, path=None, capacity=MEMO_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                self.entries = pickle.load(f)
+
+    def get(self, version, sentence):
+        key = (version, sentence_key(sentence))
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return key, None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return key, value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def save(self, path=None):
+        path = path or self.path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def report(self):
+        total = self.hits + self.misses
+        print(f"Prediction memo: {self.hits}/{total} hits ({100.0 * self.hits / max(total, 1):.1f}%), "
+              f"{len(self.entries)} entries")
@@ -0,0 +1,125 @@
+import cProfile
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+def peak_rss_mb():
+    """ Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS). """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class StageProfiler:
+    """
+    Accumulates wall time, the net change in live allocated blocks (negative when a stage frees
+    more than it allocates, e.g. releasing a previous stage's matrices) and peak RSS per named stage.
+    With track_memory on, tracemalloc also records the peak traced Python memory of each stage
+    (slows allocation-heavy code noticeably, so it is off by default).
+    """
+
+    def __init__(self, enabled=False, track_memory=False):
+        self.enabled = enabled
+        self.track_memory = track_memory
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def configure(self, enabled=True, track_memory=False):
+        self.enabled = enabled
+        self.track_memory = track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        if self.track_memory:
+            tracemalloc.reset_peak()
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            net_blocks = sys.getallocatedblocks() - blocks
+            traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if self.track_memory else 0.0
+            with self.lock:
+                entry = self.stats.setdefault(name, {"calls": 0, "total_s": 0.0, "net_blocks": 0,
+                                                     "traced_peak_mb": 0.0, "peak_rss_mb": 0.0})
+                entry["calls"] += 1
+                entry["total_s"] += elapsed
+                entry["net_blocks"] += net_blocks
+                entry["traced_peak_mb"] = max(entry["traced_peak_mb"], traced_peak)
+                entry["peak_rss_mb"] = max(entry["peak_rss_mb"], peak_rss_mb())
+
+    def report(self):
+        if not self.stats:
+            return
+        print(f"{'stage':<24}{'calls':>8}{'total s':>10}{'mean ms':>10}{'net blocks':>12}{'traced MB':>11}{'rss MB':>9}")
+        for name, s in sorted(self.stats.items(), key=lambda kv: -kv[1]["total_s"]):
+            print(f"{name:<24}{s['calls']:>8}{s['total_s']:>10.3f}{1000 * s['total_s'] / s['calls']:>10.3f}"
+                  f"{s['net_blocks']:>12}{s['traced_peak_mb']:>11.1f}{s['peak_rss_mb']:>9.1f}")
+
+
+# Shared by xgb_lr.py and the modules built on it
+profiler = StageProfiler()
+stage = profiler.stage
+
+
+@contextmanager
+def cprofile(output_path=None, top=25):
+    """ Runs the block under cProfile, printing the top functions by cumulative time. """
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        if output_path:
+            profile.dump_stats(output_path)
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(top)
+
+
+@contextmanager
+def sampling(output_path, interval=0.005):
+    """
+    Low-overhead sampling profiler: records every thread's stack (including the training
+    threads) every `interval` seconds and writes collapsed stacks (one "a;b;c count" line each)
+    for flamegraph tools.
+    """
+    samples = Counter()
+    stop = threading.Event()
+
+    def sample():
+        me = threading.get_ident()
+        while not stop.wait(interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_code.co_firstlineno})")
+                    frame = frame.f_back
+                samples[";".join(reversed(stack))] += 1
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield samples
+    finally:
+        stop.set()
+        sampler.join()
+        with open(output_path, "w", encoding="utf8") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
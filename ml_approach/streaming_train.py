@@ -0,0 +1,139 @@
+import json
+import os
+import pickle
+import numpy as np
+from xgboost import XGBClassifier
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from ml_approach.xgb_lr import best_xgb_params
+
+# Constants
+SOURCES = ["train_data_classified.json", "external_data.json"]  # .json state dicts or .jsonl {"text", "label"} lines
+STATES = ["adaptive-state", "maladaptive-state", "neither-state"]
+BATCH_SIZE = 2048
+N_FEATURES = 2 ** 18
+ROUNDS_PER_BATCH = 10
+MODEL_DIR = "streaming_models"
+
+# Stateless, so batches from any source map to the same feature space and nothing has to be refit
+vectorizer = HashingVectorizer(n_features=N_FEATURES, alternate_sign=False, norm="l2")
+
+
+def load_json_sources(sources):
+    """ Parses the .json state-dict sources, which cannot be streamed, once for a pass over the data. """
+    loaded = {}
+    for path in sources:
+        if not path.endswith(".jsonl"):
+            with open(path, "r", encoding="utf8") as f:
+                loaded[path] = json.load(f)
+    return loaded
+
+
+def iter_state(sources, state, loaded):
+    """
+    Streams the statements labelled `state` from every source, one source at a time.
+    JSON-lines sources are read line by line, so they never need to fit in memory; only those
+    keep memory flat. .json sources come from `loaded`, shared by the iterators of all states.
+    """
+    for path in sources:
+        if path.endswith(".jsonl"):
+            with open(path, "r", encoding="utf8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        if record.get("label") == state:
+                            yield record["text"]
+        else:
+            yield from loaded[path].get(state, [])
+
+
+def count_states(sources):
+    loaded = load_json_sources(sources)
+    return {state: sum(1 for _ in iter_state(sources, state, loaded)) for state in STATES}
+
+
+def balanced_batches(sources, positive_state, counts, batch_size=BATCH_SIZE, seed=42):
+    """
+    Yields stratified minibatches: every batch draws from each state in proportion to its size,
+    so the skewed sources (e.g. 13,777 maladaptive vs 613 adaptive external statements) are
+    spread evenly over training. Sample weights rebalance the positive and negative classes.
+    """
+    rng = np.random.default_rng(seed)
+    states = [s for s in STATES if counts[s]]
+    total = sum(counts[s] for s in states)
+    n_pos = counts[positive_state]
+    n_neg = total - n_pos
+    weight = {1: total / (2.0 * n_pos) if n_pos else 1.0, 0: total / (2.0 * n_neg) if n_neg else 1.0}
+
+    loaded = load_json_sources(sources)
+    iterators = {s: iter_state(sources, s, loaded) for s in states}
+    per_batch = {s: max(1, round(batch_size * counts[s] / total)) for s in states}
+    while iterators:
+        texts, labels = [], []
+        for state in list(iterators):
+            for _ in range(per_batch[state]):
+                text = next(iterators[state], None)
+                if text is None:
+                    del iterators[state]
+                    break
+                texts.append(text)
+                labels.append(1 if state == positive_state else 0)
+        if not texts:
+            break
+        order = rng.permutation(len(texts))
+        y = np.asarray(labels)[order]
+        yield [texts[i] for i in order], y, np.vectorize(weight.get)(y).astype(float)
+
+
+def load_models(model_dir=MODEL_DIR):
+    """ Previously trained models to continue from, or (None, None) for a fresh start. """
+    lr_path = os.path.join(model_dir, "sgd_adapt.pkl")
+    xgb_path = os.path.join(model_dir, "xgb_mal.json")
+    sgd_adapt = xgb_mal = None
+    if os.path.exists(lr_path):
+        with open(lr_path, "rb") as f:
+            sgd_adapt = pickle.load(f)
+    if os.path.exists(xgb_path):
+        xgb_mal = XGBClassifier()
+        xgb_mal.load_model(xgb_path)
+    return sgd_adapt, xgb_mal
+
+
+def save_models(sgd_adapt, xgb_mal, model_dir=MODEL_DIR):
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, "sgd_adapt.pkl"), "wb") as f:
+        pickle.dump(sgd_adapt, f)
+    xgb_mal.save_model(os.path.join(model_dir, "xgb_mal.json"))
+
+
+def train_streaming(sources=SOURCES, model_dir=MODEL_DIR):
+    """
+    Trains (or, when models already exist in `model_dir`, continues training) the adaptive
+    logistic model with SGD partial_fit and the maladaptive XGBoost model by adding
+    ROUNDS_PER_BATCH trees per minibatch, so new labelled data can be folded in without a retrain.
+    """
+    counts = count_states(sources)
+    print(f"Statements per state: {counts}")
+    sgd_adapt, xgb_mal = load_models(model_dir)
+
+    if sgd_adapt is None:
+        sgd_adapt = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+    for texts, labels, weights in balanced_batches(sources, "adaptive-state", counts):
+        sgd_adapt.partial_fit(vectorizer.transform(texts), labels, classes=[0, 1], sample_weight=weights)
+
+    params = dict(best_xgb_params, n_estimators=ROUNDS_PER_BATCH)
+    for texts, labels, weights in balanced_batches(sources, "maladaptive-state", counts):
+        if len(set(labels)) < 2:
+            continue
+        booster = xgb_mal.get_booster() if xgb_mal is not None else None
+        xgb_mal = XGBClassifier(**params, objective='binary:logistic', eval_metric='logloss', random_state=42)
+        xgb_mal.fit(vectorizer.transform(texts), labels, sample_weight=weights, xgb_model=booster)
+
+    save_models(sgd_adapt, xgb_mal, model_dir)
+    print(f"Streaming models saved in {model_dir}")
+    return sgd_adapt, xgb_mal
+
+
+if __name__ == "__main__":
+    train_streaming()
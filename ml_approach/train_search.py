@@ -0,0 +1,144 @@
+import csv
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from joblib import Parallel, delayed
+from xgboost import XGBClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import f1_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from ml_approach.xgb_lr import BEST_PARAMS_PATH, load_train_data, prepare_data
+
+# Constants
+N_FOLDS = 5
+N_JOBS = -1
+EARLY_STOPPING_ROUNDS = 20
+EARLY_STOPPING_FRACTION = 0.15  # of each fold's training rows, held out to pick the number of rounds
+results_file = "search_results.csv"
+
+xgb_grid = {
+    'n_estimators': [500],  # upper bound, early stopping picks the actual number of rounds
+    'learning_rate': [0.05, 0.1, 0.2],
+    'max_depth': [3, 4, 6],
+}
+lr_grid = {
+    'C': [0.1, 0.5, 1.0, 2.0, 5.0],
+}
+
+
+def expand_grid(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def build_folds(texts, labels, n_folds=N_FOLDS):
+    """
+    Fits the TF-IDF vectorizer once per fold and caches the fold matrices,
+    so every parameter candidate reuses them instead of recomputing TF-IDF.
+    Each fold also caches a stratified split of its training rows for XGBoost early stopping,
+    so the number of rounds is never chosen on the validation rows it is scored on.
+    """
+    texts = np.asarray(texts, dtype=object)
+    labels = np.asarray(labels)
+    folds = []
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    for train_idx, val_idx in splitter.split(texts, labels):
+        vectorizer = TfidfVectorizer()
+        X_train = vectorizer.fit_transform(texts[train_idx])
+        X_val = vectorizer.transform(texts[val_idx])
+        y_train = labels[train_idx]
+        fit_rows, stop_rows = train_test_split(np.arange(len(train_idx)), test_size=EARLY_STOPPING_FRACTION,
+                                               stratify=y_train, random_state=42)
+        stopping = (X_train[fit_rows], y_train[fit_rows], X_train[stop_rows], y_train[stop_rows])
+        folds.append((X_train, y_train, X_val, labels[val_idx], stopping))
+    return folds
+
+
+def score_fold(model, X_val, y_val):
+    proba = model.predict_proba(X_val)[:, 1]
+    return f1_score(y_val, proba >= 0.5), roc_auc_score(y_val, proba)
+
+
+def fit_xgb_fold(params, fold):
+    _, _, X_val, y_val, (X_fit, y_fit, X_stop, y_stop) = fold
+    model = XGBClassifier(**params,
+                          objective='binary:logistic',
+                          eval_metric='logloss',
+                          early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                          n_jobs=1,
+                          random_state=42)
+    start = time.perf_counter()
+    model.fit(X_fit, y_fit, eval_set=[(X_stop, y_stop)], verbose=False)
+    fit_time = time.perf_counter() - start
+    f1, auc = score_fold(model, X_val, y_val)
+    return {"f1": f1, "roc_auc": auc, "fit_time": fit_time, "best_iteration": model.best_iteration}
+
+
+def fit_lr_fold(params, fold):
+    X_train, y_train, X_val, y_val, _ = fold
+    model = LogisticRegression(**params, class_weight="balanced", max_iter=1000, random_state=42)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+    f1, auc = score_fold(model, X_val, y_val)
+    return {"f1": f1, "roc_auc": auc, "fit_time": fit_time}
+
+
+def search(name, fit_fn, grid, folds, n_jobs=N_JOBS):
+    """ Evaluates every (candidate, fold) pair in parallel and averages the metrics per candidate. """
+    candidates = expand_grid(grid)
+    jobs = [(i, fold) for i in range(len(candidates)) for fold in folds]
+    # threads share the cached fold matrices without pickling them to every worker
+    fold_results = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(fit_fn)(candidates[i], fold) for i, fold in jobs)
+
+    rows = []
+    for i, params in enumerate(candidates):
+        per_fold = [r for (j, _), r in zip(jobs, fold_results) if j == i]
+        row = {"model": name, "params": json.dumps(params)}
+        for metric in per_fold[0]:
+            row[metric] = float(np.mean([r[metric] for r in per_fold]))
+        rows.append(row)
+    return rows
+
+
+def best_params(rows, grid_params):
+    best = max(rows, key=lambda r: r["f1"])
+    params = json.loads(best["params"])
+    if "best_iteration" in best:
+        params["n_estimators"] = int(round(best["best_iteration"])) + 1
+    return {k: v for k, v in params.items() if k in grid_params}
+
+
+def main():
+    train_data = load_train_data()
+    texts_mal, labels_mal = prepare_data(train_data, "maladaptive-state", ["adaptive-state", "neither-state"])
+    texts_adapt, labels_adapt = prepare_data(train_data, "adaptive-state", ["maladaptive-state", "neither-state"])
+
+    # both searches run concurrently, each fanning out over its own candidates and folds
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        xgb_rows = executor.submit(lambda: search("xgb", fit_xgb_fold, xgb_grid, build_folds(texts_mal, labels_mal)))
+        lr_rows = executor.submit(lambda: search("lr", fit_lr_fold, lr_grid, build_folds(texts_adapt, labels_adapt)))
+        xgb_rows, lr_rows = xgb_rows.result(), lr_rows.result()
+
+    rows = xgb_rows + lr_rows
+    fieldnames = ["model", "params", "f1", "roc_auc", "fit_time", "best_iteration"]
+    with open(results_file, "w", newline="", encoding="utf8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    tuned = {"xgb": best_params(xgb_rows, xgb_grid), "lr": best_params(lr_rows, lr_grid)}
+    with open(BEST_PARAMS_PATH, "w", encoding="utf8") as f:
+        json.dump(tuned, f, indent=2)
+
+    print(f"Search results saved as {results_file}")
+    print(f"Best params saved as {BEST_PARAMS_PATH}: {tuned}")
+
+
+if __name__ == "__main__":
+    main()
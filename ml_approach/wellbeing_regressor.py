@@ -0,0 +1,66 @@
+import json
+import os
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+# Posts whose score confidence falls below this are routed to the LLM
+WELLBEING_CONFIDENCE = 0.6
+SCORE_KEYS = ["well-being_score", "wellbeing_score", "well-being score"]
+
+
+def load_scored_posts(folder):
+    """ Collects (post text, well-being score) pairs from a folder of annotated timeline JSON files. """
+    texts, scores = [], []
+    for filename in os.listdir(folder):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(folder, filename), "r", encoding="utf-8") as file:
+            try:
+                timeline = json.load(file)
+            except json.JSONDecodeError:
+                print(f"Error reading {filename}")
+                continue
+        for post in timeline.get("posts", []):
+            score = next((post[k] for k in SCORE_KEYS if post.get(k) is not None), None)
+            if score is None:
+                continue
+            texts.append(post.get("post", ""))
+            scores.append(int(score))
+    return texts, scores
+
+
+def train_wellbeing_model(texts, scores):
+    """ Fits an ordinal-style classifier over the 1-10 scores on the usual TF-IDF features. """
+    vectorizer = TfidfVectorizer()
+    X = vectorizer.fit_transform(texts)
+    model = LogisticRegression(class_weight="balanced", max_iter=1000, random_state=42)
+    model.fit(X, scores)
+    return vectorizer, model
+
+
+def predict_scores(vectorizer, model, texts):
+    """
+    Predicts scores for a batch of posts in one transform.
+    The score is the rounded expectation over the class probabilities; the confidence is the
+    probability mass within one point of it, which respects the ordering of the scale.
+    """
+    if not texts:
+        return [], []
+    proba = model.predict_proba(vectorizer.transform(texts))
+    classes = model.classes_.astype(float)
+    expected = proba @ classes
+    predicted = np.clip(np.rint(expected), 1, 10).astype(int)
+    near = np.abs(classes[None, :] - predicted[:, None]) <= 1
+    confidence = (proba * near).sum(axis=1)
+    return predicted.tolist(), confidence.tolist()
+
+
+def predict_wellbeing_gated(vectorizer, model, post_text, llm_fn, stats, threshold=WELLBEING_CONFIDENCE):
+    """ Returns the model score when confident, otherwise falls back to `llm_fn` (the script's predict_wellbeing). """
+    [score], [confidence] = predict_scores(vectorizer, model, [post_text])
+    if confidence >= threshold:
+        stats["model"] = stats.get("model", 0) + 1
+        return {"wellbeing_score": score, "confidence": confidence}
+    stats["llm"] = stats.get("llm", 0) + 1
+    return llm_fn(post_text)
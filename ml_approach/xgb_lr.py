@@ -1,19 +1,58 @@
 import json
+import os
 import random
-import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+if __package__ in (None, ""):
+    # run as `python xgb_lr.py` from ml_approach/: make segmenter and ml_approach.* importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import numpy as np
+from segmenter import default_cache
 from xgboost import XGBClassifier
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 
+from ml_approach.profiling import cprofile, profiler, sampling, stage
+
+TRAIN_PATH = "train_data_classified.json"
+TEST_PATH = "test_predict.json"
+SUBMISSION_PATH = "test_submission.json"
+# Folder of annotated timelines used to train the well-being score model; None keeps the constant score
+WELLBEING_TRAIN_FOLDER = None
+# Use the models trained by streaming_train.py from this folder instead of fitting in memory
+STREAMING_MODEL_DIR = None
+# Persistent LRU memo of per-sentence decisions; None disables it
+MEMO_PATH = "prediction_memo.pkl"
+# Emit sub-sentence evidence spans from linear per-token scores instead of whole voted sentences
+SPAN_MODE = False
+# Stage timers/memory probes and optional whole-run profilers
+PROFILE_STAGES = False
+PROFILE_MEMORY = False
+CPROFILE_PATH = None  # e.g. "xgb_lr.prof"
+SAMPLING_PATH = None  # e.g. "xgb_lr.stacks" (collapsed stacks for flamegraphs)
+
 def extract_sentences(text):
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    return [s.strip() for s in sentences if s.strip()]
+    """ Sentences of a post, from the shared segmentation cache (segmenter.py). """
+    return [text[s:e] for s, e in default_cache().spans(text)]
 
 best_xgb_params = {'n_estimators': 200, 'learning_rate': 0.1, 'max_depth': 4}
+best_lr_params = {'C': 1.0}
+
+# Written by train_search.py; overrides the defaults above when present
+BEST_PARAMS_PATH = "best_params.json"
+if os.path.exists(BEST_PARAMS_PATH):
+    with open(BEST_PARAMS_PATH, "r", encoding="utf8") as f:
+        _tuned = json.load(f)
+    best_xgb_params.update(_tuned.get("xgb", {}))
+    best_lr_params.update(_tuned.get("lr", {}))
 
-with open("train_data_classified.json", "r", encoding="utf8") as f:
-    train_data = json.load(f)
+noise_std = 1e-3
+
+def load_train_data(path=TRAIN_PATH):
+    with stage("json_load"), open(path, "r", encoding="utf8") as f:
+        return json.load(f)
 
 def prepare_data(sc_dict, positive_key, negative_keys):
     texts, labels = [], []
@@ -24,67 +63,181 @@ def prepare_data(sc_dict, positive_key, negative_keys):
     labels.extend([1] * len(sc_dict.get(positive_key, [])))
     return texts, labels
 
-texts_mal, labels_mal = prepare_data(train_data, "maladaptive-state", ["adaptive-state", "neither-state"])
-combined_mal = list(zip(texts_mal, labels_mal))
-random.shuffle(combined_mal)
-texts_mal, labels_mal = zip(*combined_mal)
-
-vectorizer_mal = TfidfVectorizer()
-X_mal = vectorizer_mal.fit_transform(texts_mal)
-
-xgb_model_mal = XGBClassifier(**best_xgb_params,
-                              objective='binary:logistic',
-                              use_label_encoder=False,
-                              eval_metric='logloss',
-                              random_state=42)
-xgb_model_mal.fit(X_mal, labels_mal)
-
-texts_adapt, labels_adapt = prepare_data(train_data, "adaptive-state", ["maladaptive-state", "neither-state"])
-combined_adapt = list(zip(texts_adapt, labels_adapt))
-random.shuffle(combined_adapt)
-texts_adapt, labels_adapt = zip(*combined_adapt)
-
-vectorizer_adapt = TfidfVectorizer()
-X_adapt = vectorizer_adapt.fit_transform(texts_adapt)
-
-lr_model_adapt = LogisticRegression(class_weight="balanced", max_iter=1000, random_state=42)
-lr_model_adapt.fit(X_adapt, labels_adapt)
-
-with open("test_predict.json", "r", encoding="utf8") as infile:
-    pred_timelines = json.load(infile)
-
-noise_std = 1e-3
-
-for timeline in pred_timelines:
-    timeline["post_level"] = {}
-    
-    for post in timeline.get("posts", []):
-        original_post = post.get("post", "")
-        post["wellbeing_score"] = 1
-        adaptive_evidence = []
-        maladaptive_evidence = []
-        sentences = extract_sentences(original_post)
-        
-        for sentence in sentences:
-            vec_adapt = vectorizer_adapt.transform([sentence]).toarray()
-            preds_adapt = [lr_model_adapt.predict(vec_adapt + np.random.normal(0, noise_std, vec_adapt.shape))[0] for _ in range(50)]
-            if np.argmax(np.bincount(preds_adapt)) == 1:
-                adaptive_evidence.append(sentence)
-            
-            vec_mal = vectorizer_mal.transform([sentence]).toarray()
-            preds_mal = [xgb_model_mal.predict(vec_mal + np.random.normal(0, noise_std, vec_mal.shape))[0] for _ in range(100)]
-            if np.argmax(np.bincount(preds_mal)) == 1:
-                maladaptive_evidence.append(sentence)
-        
-        post["adaptive_evidence"] = adaptive_evidence
-        post["maladaptive_evidence"] = maladaptive_evidence
-        
-        post_id = post.get("post_id")
-        if post_id:
-            timeline["post_level"][post_id] = {"summary": ""}
-
-submission = {timeline.get("timeline_id"): timeline for timeline in pred_timelines if timeline.get("timeline_id")}
-
-with open("test_submission.json", "w", encoding="utf8") as outfile:
-    json.dump(submission, outfile, ensure_ascii=False, indent=2)
+def shuffle_data(texts, labels):
+    combined = list(zip(texts, labels))
+    random.Random(42).shuffle(combined)  # seeded so retraining on the same data gives the same artifacts
+    texts, labels = zip(*combined)
+    return texts, labels
 
+def train_maladaptive(train_data):
+    """ Fits the TF-IDF + XGBoost maladaptive sentence classifier. """
+    texts_mal, labels_mal = prepare_data(train_data, "maladaptive-state", ["adaptive-state", "neither-state"])
+    texts_mal, labels_mal = shuffle_data(texts_mal, labels_mal)
+
+    vectorizer_mal = TfidfVectorizer()
+    with stage("tfidf_fit_mal"):
+        X_mal = vectorizer_mal.fit_transform(texts_mal)
+
+    xgb_model_mal = XGBClassifier(**best_xgb_params,
+                                  objective='binary:logistic',
+                                  use_label_encoder=False,
+                                  eval_metric='logloss',
+                                  random_state=42)
+    with stage("xgb_fit"):
+        xgb_model_mal.fit(X_mal, labels_mal)
+    return vectorizer_mal, xgb_model_mal
+
+def train_adaptive(train_data):
+    """ Fits the TF-IDF + LogisticRegression adaptive sentence classifier. """
+    texts_adapt, labels_adapt = prepare_data(train_data, "adaptive-state", ["maladaptive-state", "neither-state"])
+    texts_adapt, labels_adapt = shuffle_data(texts_adapt, labels_adapt)
+
+    vectorizer_adapt = TfidfVectorizer()
+    with stage("tfidf_fit_adapt"):
+        X_adapt = vectorizer_adapt.fit_transform(texts_adapt)
+
+    lr_model_adapt = LogisticRegression(**best_lr_params, class_weight="balanced", max_iter=1000, random_state=42)
+    with stage("lr_fit"):
+        lr_model_adapt.fit(X_adapt, labels_adapt)
+    return vectorizer_adapt, lr_model_adapt
+
+def train_classifiers(train_data):
+    """ Fits the maladaptive and adaptive classifiers concurrently (XGBoost and liblinear/lbfgs release the GIL). """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        mal = executor.submit(train_maladaptive, train_data)
+        adapt = executor.submit(train_adaptive, train_data)
+        vectorizer_mal, xgb_model_mal = mal.result()
+        vectorizer_adapt, lr_model_adapt = adapt.result()
+    return vectorizer_adapt, lr_model_adapt, vectorizer_mal, xgb_model_mal
+
+def noisy_vote(model, vec, n_votes):
+    """ Majority vote of `model` over `n_votes` slightly perturbed copies of `vec`. """
+    preds = [model.predict(vec + np.random.normal(0, noise_std, vec.shape))[0] for _ in range(n_votes)]
+    return np.argmax(np.bincount(preds)) == 1
+
+def classify_sentences(sentences, vectorizer_adapt, lr_model_adapt, vectorizer_mal, xgb_model_mal,
+                       memo=None, memo_version=None, noisy_votes=True):
+    """
+    Adaptive and maladaptive sentences by noisy voting on dense TF-IDF rows. With `noisy_votes`
+    off (the 2**18-wide hashed features of the streaming models, where densifying is slow and
+    the noise is no longer small next to the input) each model predicts once on the sparse row.
+    """
+    adaptive_evidence = []
+    maladaptive_evidence = []
+    for sentence in sentences:
+        if memo is not None:
+            key, decisions = memo.get(memo_version, sentence)
+            if decisions is not None:
+                if decisions[0]:
+                    adaptive_evidence.append(sentence)
+                if decisions[1]:
+                    maladaptive_evidence.append(sentence)
+                continue
+
+        with stage("transform_adapt"):
+            vec_adapt = vectorizer_adapt.transform([sentence])
+        with stage("predict_votes_adapt"):
+            if noisy_votes:
+                is_adaptive = noisy_vote(lr_model_adapt, vec_adapt.toarray(), 50)
+            else:
+                is_adaptive = lr_model_adapt.predict(vec_adapt)[0] == 1
+        if is_adaptive:
+            adaptive_evidence.append(sentence)
+
+        with stage("transform_mal"):
+            vec_mal = vectorizer_mal.transform([sentence])
+        with stage("predict_votes_mal"):
+            if noisy_votes:
+                is_maladaptive = noisy_vote(xgb_model_mal, vec_mal.toarray(), 100)
+            else:
+                is_maladaptive = xgb_model_mal.predict(vec_mal)[0] == 1
+        if is_maladaptive:
+            maladaptive_evidence.append(sentence)
+
+        if memo is not None:
+            memo.put(key, (bool(is_adaptive), bool(is_maladaptive)))
+    return adaptive_evidence, maladaptive_evidence
+
+def main():
+    if STREAMING_MODEL_DIR:
+        from ml_approach.streaming_train import load_models, vectorizer as hashing_vectorizer
+        lr_model_adapt, xgb_model_mal = load_models(STREAMING_MODEL_DIR)
+        vectorizer_adapt = vectorizer_mal = hashing_vectorizer
+    else:
+        train_data = load_train_data()
+        vectorizer_adapt, lr_model_adapt, vectorizer_mal, xgb_model_mal = train_classifiers(train_data)
+
+    with stage("json_load"), open(TEST_PATH, "r", encoding="utf8") as infile:
+        pred_timelines = json.load(infile)
+
+    if SPAN_MODE:
+        from ml_approach.span_scoring import adaptive_scorer, maladaptive_surrogate
+        texts_mal, _ = prepare_data(load_train_data(), "maladaptive-state", ["adaptive-state", "neither-state"])
+        span_adapt = adaptive_scorer(vectorizer_adapt, lr_model_adapt)
+        span_mal = maladaptive_surrogate(vectorizer_mal, xgb_model_mal, texts_mal)
+
+    memo = memo_version = None
+    if MEMO_PATH:
+        from ml_approach.prediction_memo import PredictionMemo, artifact_version
+        memo = PredictionMemo(MEMO_PATH)
+        memo_version = artifact_version(vectorizer_adapt, lr_model_adapt, vectorizer_mal, xgb_model_mal,
+                                        "single-predict" if STREAMING_MODEL_DIR else noise_std)
+
+    scores = {}
+    if WELLBEING_TRAIN_FOLDER:
+        from ml_approach.wellbeing_regressor import load_scored_posts, train_wellbeing_model, predict_scores
+        wellbeing_vectorizer, wellbeing_model = train_wellbeing_model(*load_scored_posts(WELLBEING_TRAIN_FOLDER))
+        all_posts = [post for timeline in pred_timelines for post in timeline.get("posts", [])]
+        predicted, _ = predict_scores(wellbeing_vectorizer, wellbeing_model, [p.get("post", "") for p in all_posts])
+        scores = {id(post): score for post, score in zip(all_posts, predicted)}
+
+    for timeline in pred_timelines:
+        timeline["post_level"] = {}
+
+        for post in timeline.get("posts", []):
+            original_post = post.get("post", "")
+            post["wellbeing_score"] = scores.get(id(post), 1)
+            if SPAN_MODE:
+                with stage("span_scoring"):
+                    adaptive_evidence = span_adapt.extract(original_post)
+                    maladaptive_evidence = span_mal.extract(original_post)
+            else:
+                with stage("sentence_split"):
+                    sentences = extract_sentences(original_post)
+
+                adaptive_evidence, maladaptive_evidence = classify_sentences(
+                    sentences, vectorizer_adapt, lr_model_adapt, vectorizer_mal, xgb_model_mal, memo, memo_version,
+                    noisy_votes=not STREAMING_MODEL_DIR)
+
+            post["adaptive_evidence"] = adaptive_evidence
+            post["maladaptive_evidence"] = maladaptive_evidence
+
+            post_id = post.get("post_id")
+            if post_id:
+                timeline["post_level"][post_id] = {"summary": ""}
+
+    submission = {timeline.get("timeline_id"): timeline for timeline in pred_timelines if timeline.get("timeline_id")}
+
+    with open(SUBMISSION_PATH, "w", encoding="utf8") as outfile:
+        json.dump(submission, outfile, ensure_ascii=False, indent=2)
+
+    default_cache().save()
+    if memo is not None:
+        memo.save()
+        memo.report()
+
+def run():
+    if PROFILE_STAGES:
+        profiler.configure(enabled=True, track_memory=PROFILE_MEMORY)
+    if CPROFILE_PATH:
+        with cprofile(CPROFILE_PATH):
+            main()
+    elif SAMPLING_PATH:
+        with sampling(SAMPLING_PATH):
+            main()
+    else:
+        main()
+    profiler.report()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,139 @@
+import re
+
+from segmenter import default_cache
+from tokens import CHARS_PER_TOKEN, estimate_tokens
+
+URL_RE = re.compile(r'(?:https?://|www\.)\S+')
+MD_LINK_RE = re.compile(r'\[([^\]\n]*)\]\([^)\s]*\)')
+MD_EMPHASIS_RE = re.compile(r'\*\*|__|~~|(?<!\w)[*_](?=\w)|(?<=\w)[*_](?!\w)|`')
+MD_LINE_PREFIX_RE = re.compile(r'^[ \t]*(?:#{1,6}[ \t]+|(?:&gt;|>)+[ \t]?|[-*+][ \t]+)', re.M)
+HTML_ENTITIES = {"&amp;": "&", "&lt;": "<", "&gt;": ">", "&nbsp;": " ", "&#x200B;": ""}
+
+# Words that tend to carry self-state content; used to rank sentences when trimming
+SALIENT_WORDS = {
+    "i", "i'm", "im", "me", "my", "myself", "feel", "feeling", "felt", "want", "can't", "cant", "never",
+    "always", "hate", "love", "hope", "scared", "afraid", "anxious", "anxiety", "depressed", "depression",
+    "sad", "alone", "lonely", "happy", "better", "worse", "tired", "die", "suicide", "suicidal", "hurt",
+    "help", "therapy", "therapist", "friends", "family", "work", "sleep", "cry", "angry", "panic",
+}
+
+
+def normalize_post(text, strip_urls=True, strip_markup=True, dedupe_lines=True):
+    """
+    Compresses a post for prompting and returns (normalized_text, index_map), where
+    index_map[i] is the position in `text` of normalized character i, so spans the LLM quotes
+    from the normalized text can be mapped back to the original post.
+    """
+    keep = [True] * len(text)
+    replace = {}
+
+    def drop(start, end):
+        for i in range(start, end):
+            keep[i] = False
+
+    if strip_urls:
+        for m in URL_RE.finditer(text):
+            drop(m.start(), m.end())
+    if strip_markup:
+        for m in MD_LINK_RE.finditer(text):
+            drop(m.start(), m.start(1))  # "["
+            drop(m.end(1), m.end())  # "](url)"
+        for m in MD_EMPHASIS_RE.finditer(text):
+            drop(m.start(), m.end())
+        for m in MD_LINE_PREFIX_RE.finditer(text):
+            drop(m.start(), m.end())
+        for entity, value in HTML_ENTITIES.items():
+            for m in re.finditer(re.escape(entity), text):
+                drop(m.start() + len(value), m.end())
+                for k, ch in enumerate(value):
+                    replace[m.start() + k] = ch
+    if dedupe_lines:
+        seen = set()
+        for m in re.finditer(r'[^\n]+', text):
+            key = " ".join(MD_LINE_PREFIX_RE.sub("", m.group()).split()).lower()
+            if len(key) > 3 and key in seen:  # keep short repeats like "ok"
+                drop(m.start(), m.end())
+            seen.add(key)
+
+    chars, index_map = [], []
+    pending_space = None
+    for i, ch in enumerate(text):
+        if not keep[i]:
+            continue
+        ch = replace.get(i, ch)
+        if ch.isspace():
+            if pending_space is None or ch == "\n":
+                pending_space = (("\n" if ch == "\n" else " "), i)
+            continue
+        if pending_space is not None and chars:
+            chars.append(pending_space[0])
+            index_map.append(pending_space[1])
+        pending_space = None
+        chars.append(ch)
+        index_map.append(i)
+    return "".join(chars), index_map
+
+
+def map_span_to_original(span, normalized, index_map, original):
+    """ Returns the original-text substring for a span quoted from the normalized text. """
+    if not isinstance(span, str) or not span.strip():
+        return span
+    span = span.strip()
+    if span in original:
+        return span
+    start = normalized.find(span)
+    if start < 0:
+        start = normalized.lower().find(span.lower())
+    if start < 0:
+        return span  # paraphrased by the model, nothing to map
+    end = start + len(span) - 1
+    return original[index_map[start]:index_map[end] + 1]
+
+
+def trim_extractive(text, max_tokens):
+    """
+    Keeps the most self-state-salient sentences of `text` (in their original order) within
+    `max_tokens`; the first sentence is always kept for context.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    sentences = [text[s:e] for s, e in default_cache().spans(text)]
+    if len(sentences) <= 1:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+
+    def salience(sentence):
+        words = re.findall(r"[\w']+", sentence.lower())
+        return sum(w in SALIENT_WORDS for w in words) / (len(words) + 1)
+
+    ranked = [0] + sorted(range(1, len(sentences)), key=lambda i: salience(sentences[i]), reverse=True)
+    chosen, used = set(), 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i])
+        if used + cost > max_tokens:
+            continue
+        chosen.add(i)
+        used += cost
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+class TokenLedger:
+    """ Counts estimated prompt tokens before and after normalization, per post and per run. """
+
+    def __init__(self):
+        self.posts = 0
+        self.before = 0
+        self.after = 0
+
+    def add(self, original, prompt_texts):
+        """ Records one post whose text went into each prompt as the matching entry of `prompt_texts`. """
+        before = estimate_tokens(original) * len(prompt_texts)
+        after = sum(estimate_tokens(t) for t in prompt_texts)
+        self.posts += 1
+        self.before += before
+        self.after += after
+        return before - after
+
+    def report(self):
+        saved = self.before - self.after
+        print(f"Post tokens in prompts: {self.before} -> {self.after} over {self.posts} posts "
+              f"({saved} saved, {100.0 * saved / max(self.before, 1):.1f}%)")
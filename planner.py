@@ -0,0 +1,102 @@
+import json
+import os
+from collections import defaultdict
+
+from tokens import estimate_tokens
+
+CONCURRENCY_LEVELS = [1, 2, 4, 8]
+# Fraction of a request's cost that does not parallelize on one Ollama server (memory bandwidth bound)
+CONTENTION = 0.5
+
+# Used for models/tasks with no telemetry yet; rough CPU numbers for 7-9B quantized models
+DEFAULT_PROFILE = {"prompt_tps": 60.0, "gen_tps": 8.0, "load_s": 20.0}
+DEFAULT_OUTPUT_TOKENS = {"extract_evidence": 150, "predict_wellbeing": 15, "summarize_post": 120,
+                         "summarize_timeline": 250, "update_timeline_summary": 250,
+                         "predict_wellbeing_batch": 60}
+
+
+def record_telemetry(path, model, task, response_json):
+    """ Appends the timing fields Ollama returns with every generation to a JSON-lines file. """
+    fields = ["prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration",
+              "load_duration", "total_duration"]
+    entry = {"model": model, "task": task}
+    entry.update({k: response_json[k] for k in fields if k in response_json})
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def load_profiles(telemetry_path):
+    """
+    Per-model throughput (prompt and generation tokens/s, mean load time) and per-(model, task)
+    mean output tokens, measured from telemetry recorded by earlier runs.
+    """
+    totals = defaultdict(lambda: defaultdict(float))
+    outputs = defaultdict(list)
+    if telemetry_path and os.path.exists(telemetry_path):
+        with open(telemetry_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                t = totals[entry["model"]]
+                t["prompt_tokens"] += entry.get("prompt_eval_count", 0)
+                t["prompt_ns"] += entry.get("prompt_eval_duration", 0)
+                t["gen_tokens"] += entry.get("eval_count", 0)
+                t["gen_ns"] += entry.get("eval_duration", 0)
+                if entry.get("load_duration", 0) > 1e9:  # only count real (cold) loads
+                    t["load_ns"] += entry["load_duration"]
+                    t["loads"] += 1
+                if "eval_count" in entry:
+                    outputs[(entry["model"], entry["task"])].append(entry["eval_count"])
+
+    profiles = {}
+    for model, t in totals.items():
+        profiles[model] = {
+            "prompt_tps": t["prompt_tokens"] / (t["prompt_ns"] / 1e9) if t["prompt_ns"] else DEFAULT_PROFILE["prompt_tps"],
+            "gen_tps": t["gen_tokens"] / (t["gen_ns"] / 1e9) if t["gen_ns"] else DEFAULT_PROFILE["gen_tps"],
+            "load_s": t["load_ns"] / 1e9 / t["loads"] if t["loads"] else DEFAULT_PROFILE["load_s"],
+        }
+    output_tokens = {key: sum(v) / len(v) for key, v in outputs.items()}
+    return profiles, output_tokens
+
+
+def speedup(concurrency, contention=CONTENTION):
+    return concurrency / (1 + contention * (concurrency - 1))
+
+
+def plan_sweep(models, timelines, render_prompts, telemetry_path=None, concurrency_levels=CONCURRENCY_LEVELS):
+    """
+    Prints projected calls, tokens and wall time per model and concurrency level.
+    `render_prompts(timeline)` returns the (task, prompt) pairs a script would send for one timeline,
+    built from its real templates; nothing is sent to a server.
+    """
+    prompt_tokens = defaultdict(int)
+    calls = defaultdict(int)
+    for timeline in timelines:
+        for task, prompt in render_prompts(timeline):
+            prompt_tokens[task] += estimate_tokens(prompt)
+            calls[task] += 1
+
+    profiles, measured_outputs = load_profiles(telemetry_path)
+    print(f"{sum(calls.values())} calls per model over {len(timelines)} timelines")
+    header = f"{'model':<12}{'task':<26}{'calls':>8}{'prompt tok':>12}{'output tok':>12}{'hours @1':>10}"
+    results = {}
+    for model in models:
+        profile = profiles.get(model, DEFAULT_PROFILE)
+        source = "telemetry" if model in profiles else "default profile"
+        print(f"\n{model} ({source}: {profile['prompt_tps']:.0f} prompt tok/s, {profile['gen_tps']:.1f} gen tok/s)")
+        print(header)
+        serial_s = profile["load_s"]
+        for task in calls:
+            out = measured_outputs.get((model, task), DEFAULT_OUTPUT_TOKENS.get(task, 100)) * calls[task]
+            task_s = prompt_tokens[task] / profile["prompt_tps"] + out / profile["gen_tps"]
+            serial_s += task_s
+            print(f"{'':<12}{task:<26}{calls[task]:>8}{prompt_tokens[task]:>12}{out:>12.0f}{task_s / 3600:>10.2f}")
+        walls = {c: serial_s / speedup(c) for c in concurrency_levels}
+        print("wall time: " + ", ".join(f"{walls[c] / 3600:.2f}h @{c}" for c in concurrency_levels))
+        results[model] = walls
+
+    for c in concurrency_levels:
+        print(f"Sweep total @{c}: {sum(w[c] for w in results.values()) / 3600:.2f}h")
+    return results
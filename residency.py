@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+import requests
+
+# How long Ollama keeps a model loaded after a request; sent with every call so the server's
+# default (5 minutes) never unloads a model between a sweep's slow requests
+KEEP_ALIVE = "30m"
+# Models the server's memory can hold at once (OLLAMA_MAX_LOADED_MODELS); 1 on most CPU boxes
+RESIDENT_MODELS = 1
+# A load_duration above this on a normal request means the model was evicted and reloaded
+COLD_LOAD_SECONDS = 1.0
+PRELOAD_TIMEOUT = 600  # cold loads of 7-9B models from disk can take minutes on CPU
+
+
+class ResidencyManager:
+    """
+    Keeps the sweep's current model resident on every endpoint. `acquire(model)` unloads the
+    least recently used model once more than RESIDENT_MODELS would be loaded, then preloads `model`
+    with an empty prompt so its load is paid once, up front, and logged (with the request's wall
+    time when Ollama reports no load_duration). Requests carry
+    `keep_alive` explicitly and `observe` counts reloads that still happen mid-run.
+    """
+
+    def __init__(self, endpoints, keep_alive=KEEP_ALIVE, resident_models=RESIDENT_MODELS, telemetry_path=None):
+        self.endpoints = [e for e in endpoints if e] or [""]
+        self.keep_alive = keep_alive
+        self.resident_models = resident_models
+        self.telemetry_path = telemetry_path
+        self.resident = OrderedDict()
+        self.loads = []  # (model, endpoint, load seconds, wall seconds)
+        self.unexpected_reloads = {}
+
+    def _generate(self, endpoint, model, keep_alive, timeout):
+        response = requests.post(
+            f"{endpoint}/api/generate",
+            json={"model": model, "keep_alive": keep_alive, "stream": False},
+            headers={"Content-Type": "application/json"},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def preload(self, model):
+        for endpoint in self.endpoints:
+            start = time.time()
+            try:
+                response_json = self._generate(endpoint, model, self.keep_alive, PRELOAD_TIMEOUT)
+            except requests.exceptions.RequestException as e:
+                print(f"Preloading {model} on {endpoint or 'default endpoint'} failed: {e}")
+                continue
+            wall = time.time() - start
+            # a load-only request is answered with done_reason "load" and usually no timing fields,
+            # so the request's wall time is the load time unless Ollama reports load_duration
+            if not response_json.get("load_duration"):
+                response_json = dict(response_json, load_duration=int(wall * 1e9))
+            load = response_json["load_duration"] / 1e9
+            self.loads.append((model, endpoint, load, wall))
+            print(f"Loaded {model} on {endpoint or 'default endpoint'} in {load:.1f}s")
+            if self.telemetry_path:
+                from planner import record_telemetry
+                record_telemetry(self.telemetry_path, model, "preload", response_json)
+
+    def unload(self, model):
+        for endpoint in self.endpoints:
+            try:
+                self._generate(endpoint, model, 0, 60)
+            except requests.exceptions.RequestException as e:
+                print(f"Unloading {model} on {endpoint or 'default endpoint'} failed: {e}")
+        print(f"Unloaded {model}")
+
+    def acquire(self, model):
+        if model in self.resident:
+            self.resident.move_to_end(model)
+            return
+        while len(self.resident) >= self.resident_models:
+            evicted, _ = self.resident.popitem(last=False)
+            self.unload(evicted)
+        self.preload(model)
+        self.resident[model] = True
+
+    def release(self):
+        """ Unloads every model this manager loaded, freeing the server at the end of a sweep. """
+        while self.resident:
+            model, _ = self.resident.popitem(last=False)
+            self.unload(model)
+
+    def observe(self, model, response_json):
+        if response_json.get("load_duration", 0) / 1e9 > COLD_LOAD_SECONDS:
+            self.unexpected_reloads[model] = self.unexpected_reloads.get(model, 0) + 1
+            print(f"Warning: {model} was reloaded mid-run ({response_json['load_duration'] / 1e9:.1f}s); "
+                  "another client may be evicting it")
+
+    def report(self):
+        total_load = sum(load for _, _, load, _ in self.loads)
+        print(f"Model residency: {len(self.loads)} preloads, {total_load:.1f}s loading, "
+              f"{sum(self.unexpected_reloads.values())} unexpected reloads")
+        for model, count in self.unexpected_reloads.items():
+            print(f"  {model}: reloaded {count} times mid-run")
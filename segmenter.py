@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import re
+import numpy as np
+
+# Constants
+SEGMENT_CACHE_PATH = "segments_cache.npz"
+# Bumped whenever segment() changes, so caches holding spans from older rules are rebuilt
+SEGMENTER_VERSION = 2
+DATASET_PATHS = ["train-clpsych2025-v1", "test-clpsych2025"]  # timeline folders or JSON files of timelines
+
+# Only forms that are not also everyday words ("no", "sat", "sun", "min", ...), which often end sentences
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e", "approx", "appt", "dept",
+    "misc", "jan", "feb", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec", "tue", "thu",
+    "fri", "a.m", "p.m", "u.s", "u.k",
+}
+# Terminal punctuation (with closing quotes/brackets) followed by whitespace, or a line break
+BOUNDARY_RE = re.compile(r'[.!?]+[\'")\]]*(?=\s)|\n')
+WORD_BEFORE_RE = re.compile(r'([\w.]+)$')
+NAME_AFTER_RE = re.compile(r'\s+([A-Z][a-z]+)\b')
+# Capitalised words that usually start a new sentence rather than continue a name ("Plan B. It failed.")
+SENTENCE_STARTERS = {
+    "A", "An", "And", "But", "He", "Her", "His", "How", "If", "It", "Its", "Just", "My", "No", "Not", "Now",
+    "Our", "She", "So", "That", "The", "Then", "There", "They", "This", "We", "What", "When", "Why", "You",
+}
+
+
+def post_key(text):
+    """ 64-bit hash identifying a post's text in the cache. """
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def segment(text):
+    """
+    Splits `text` into sentences and returns their (start, end) character spans, trimmed of
+    surrounding whitespace. Abbreviations ("Dr.", "e.g."), initials followed by a name ("J. Smith")
+    and ellipses followed by a lowercase word do not end a sentence; line breaks always do.
+    """
+    spans = []
+    start = 0
+    for m in BOUNDARY_RE.finditer(text):
+        end = m.end()
+        if m.group() != "\n":
+            punct = m.group()
+            if punct.startswith(".") and not punct.startswith(".."):
+                word = WORD_BEFORE_RE.search(text, 0, m.start())
+                if word and word.group(1).lower().strip(".") in ABBREVIATIONS:
+                    continue
+                initial = word.group(1) if word else ""
+                name = NAME_AFTER_RE.match(text, end) if len(initial) == 1 and initial.isupper() else None
+                if initial != "I" and name and name.group(1) not in SENTENCE_STARTERS:
+                    continue  # initials like "J. Smith"
+            if punct.startswith(".."):
+                following = text[end:end + 40].lstrip()
+                if following[:1].islower():
+                    continue
+        _append_span(text, start, end, spans)
+        start = end
+    _append_span(text, start, len(text), spans)
+    return spans
+
+
+def _append_span(text, start, end, spans):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if end > start:
+        spans.append((start, end))
+
+
+def sentences(text, cache=None):
+    cache = cache if cache is not None else default_cache()
+    return [text[s:e] for s, e in cache.spans(text)]
+
+
+class SegmentCache:
+    """
+    Sentence spans for many posts in three flat arrays: sorted 64-bit post keys, the offset of each
+    post's first span, and an (n, 2) int32 array of all spans. Posts not in the cache are segmented
+    on demand and kept in memory until `save`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.all_spans = np.zeros((0, 2), dtype=np.int32)
+        self.pending = {}
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                version = int(data["version"]) if "version" in data else 1
+                if version == SEGMENTER_VERSION:
+                    self.keys, self.offsets, self.all_spans = data["keys"], data["offsets"], data["spans"]
+                else:
+                    print(f"Ignoring {path}: segmented with segmenter version {version}, re-segmenting")
+
+    def __len__(self):
+        return len(self.keys) + len(self.pending)
+
+    def lookup(self, key):
+        i = np.searchsorted(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return [tuple(span) for span in self.all_spans[self.offsets[i]:self.offsets[i + 1]].tolist()]
+        return self.pending.get(key)
+
+    def spans(self, text):
+        key = post_key(text)
+        found = self.lookup(key)
+        if found is None:
+            found = segment(text)
+            self.pending[key] = found
+        return found
+
+    def save(self, path=None):
+        """ Merges the posts segmented since loading into the arrays and writes them. """
+        path = path or self.path
+        if self.pending:
+            known = {int(k): self.lookup(int(k)) for k in self.keys}
+            known.update(self.pending)
+            keys = np.array(sorted(known), dtype=np.int64)
+            counts = np.array([len(known[int(k)]) for k in keys], dtype=np.int64)
+            self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+            flat = [span for k in keys for span in known[int(k)]]
+            self.all_spans = np.array(flat, dtype=np.int32).reshape(-1, 2)
+            self.keys = keys
+            self.pending = {}
+        np.savez_compressed(path, keys=self.keys, offsets=self.offsets, spans=self.all_spans,
+                            version=np.int64(SEGMENTER_VERSION))
+
+
+_default_cache = None
+
+
+def default_cache():
+    """ Process-wide cache backed by SEGMENT_CACHE_PATH, shared by the ML and LLM pipelines. """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SegmentCache(SEGMENT_CACHE_PATH)
+    return _default_cache
+
+
+def save_default_cache():
+    """ Writes the process-wide cache if this run segmented posts it did not already hold. """
+    if _default_cache is not None and _default_cache.pending:
+        _default_cache.save()
+
+
+def iter_posts(path):
+    """ Post texts from a folder of timeline JSON files or a JSON file holding a list of timelines. """
+    files = [os.path.join(path, f) for f in os.listdir(path) if f.endswith(".json")] if os.path.isdir(path) else [path]
+    for file_path in files:
+        with open(file_path, "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                print(f"Error reading {file_path}")
+                continue
+        for timeline in data if isinstance(data, list) else [data]:
+            for post in timeline.get("posts", []):
+                yield post.get("post", "")
+
+
+def build_cache(paths=DATASET_PATHS, cache_path=SEGMENT_CACHE_PATH):
+    cache = SegmentCache(cache_path)
+    for path in paths:
+        if os.path.exists(path):
+            for text in iter_posts(path):
+                cache.spans(text)
+    cache.save(cache_path)
+    print(f"Segmented {len(cache)} posts into {len(cache.all_spans)} sentences, saved as {cache_path}")
+    return cache
+
+
+if __name__ == "__main__":
+    build_cache()
@@ -0,0 +1,196 @@
+import json
+import math
+import os
+import random
+import pandas as pd
+
+# Constants
+SEED = 42
+NUM_TIMELINES = 500  # the task data has ~200 train/test timelines; scale up for load tests
+POSTS_PER_TIMELINE = (4, 16)  # inclusive range
+# Post length in words: {"distribution": "lognormal", "median_words": ..., "sigma": ...},
+# {"distribution": "uniform", "min_words": ..., "max_words": ...} or {"distribution": "fixed", "words": ...}
+POST_LENGTH = {"distribution": "lognormal", "median_words": 120, "sigma": 0.8}
+MAX_POST_WORDS = 4000  # caps the lognormal tail; long posts still exercise chunking
+DUPLICATE_RATE = 0.05  # posts that repeat an earlier post verbatim (cross-posts, reposts)
+NEAR_DUPLICATE_RATE = 0.05  # posts that repeat an earlier post with whitespace/case/punctuation noise
+STATE_SENTENCE_RATE = 0.3  # share of sentences drawn from the self-state statements
+ANNOTATED = True  # add train-style labels (well-being score, evidence, summaries); False gives test-style posts
+STATEMENTS_PATH = "external_data.json"
+OUTPUT_FOLDER = "synthetic-clpsych2025"
+RESULTS_PATH = "synthetic_results_dev.csv"
+SUBMISSIONS = ["synthetic_default_promptllama3.1", "synthetic_expert_promptmistral", "synthetic_xgb_lr"]
+
+# Used when STATEMENTS_PATH is missing
+FALLBACK_STATEMENTS = {
+    "adaptive-state": ["I feel capable of getting by on my own in everyday life.",
+                       "I talked to my friend and felt supported.",
+                       "I managed to get some rest and I feel hopeful about this week."],
+    "maladaptive-state": ["I feel worthless and nobody would care if I was gone.",
+                          "I can't stop panicking about everything.",
+                          "I am so ashamed of myself that I stayed in bed all day."],
+}
+FILLER_WORDS = ("today work class home weekend morning dinner friend family week went back after before "
+                "really still again talked about with the a to and my it was just some got").split()
+# Same metrics as the organizers' results_dev files; "post" metrics have one row per post
+METRICS = [
+    ("A.1", "bertscore_recall", 2, (0.2, 0.7)),
+    ("A.1", "bertscore_weighted_recall", 2, (0.2, 0.7)),
+    ("A.1", "bertscore_recall_adaptive", 1, (0.2, 0.7)),
+    ("A.1", "bertscore_weighted_recall_adaptive", 1, (0.2, 0.7)),
+    ("A.1", "bertscore_recall_maladaptive", 1, (0.2, 0.7)),
+    ("A.1", "bertscore_weighted_recall_maladaptive", 1, (0.2, 0.7)),
+    ("A.2", "mse", 1, (0.5, 12.0)),
+    ("A.2", "mse_impaired", 1, (0.5, 12.0)),
+    ("A.2", "mse_minimal", 1, (0.5, 12.0)),
+    ("A.2", "mse_serious", 1, (0.5, 12.0)),
+    ("B", "post_max_contradiction_gold", "post", (0.0, 1.0)),
+    ("B", "post_mean_consistency_gold", "post", (0.0, 1.0)),
+    ("C", "timeline_max_contradiction_gold", 1, (0.0, 1.0)),
+    ("C", "timeline_mean_consistency_gold", 1, (0.0, 1.0)),
+]
+
+
+def load_statements(path=STATEMENTS_PATH):
+    if not os.path.exists(path):
+        return FALLBACK_STATEMENTS
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    statements = {key: [s.lstrip("!").strip() for s in data.get(key, []) if s.strip()]
+                  for key in ("adaptive-state", "maladaptive-state")}
+    return {key: values or FALLBACK_STATEMENTS[key] for key, values in statements.items()}
+
+
+def sample_post_words(rng, post_length=POST_LENGTH):
+    distribution = post_length["distribution"]
+    if distribution == "lognormal":
+        words = rng.lognormvariate(math.log(post_length["median_words"]), post_length["sigma"])
+    elif distribution == "uniform":
+        words = rng.randint(post_length["min_words"], post_length["max_words"])
+    elif distribution == "fixed":
+        words = post_length["words"]
+    else:
+        raise ValueError(f"Unknown post length distribution: {distribution}")
+    return max(5, min(int(words), MAX_POST_WORDS))
+
+
+def filler_sentence(rng):
+    words = rng.choices(FILLER_WORDS, k=rng.randint(6, 18))
+    return "I " + " ".join(words) + rng.choice([".", ".", ".", "!", "?"])
+
+
+def generate_post(rng, statements, target_words):
+    """ Builds a post of about `target_words` words; returns its text and the statements it contains. """
+    sentences, evidence = [], {"adaptive-state": [], "maladaptive-state": []}
+    # each post leans towards one state so well-being scores spread over the whole scale
+    mal_share = rng.random()
+    words = 0
+    while words < target_words:
+        if rng.random() < STATE_SENTENCE_RATE:
+            state = "maladaptive-state" if rng.random() < mal_share else "adaptive-state"
+            sentence = rng.choice(statements[state])
+            evidence[state].append(sentence)
+        else:
+            sentence = filler_sentence(rng)
+        sentences.append(sentence)
+        words += len(sentence.split())
+    return " ".join(sentences), evidence
+
+
+def perturb(rng, text):
+    """ Near-duplicate of `text`: same content with whitespace, case and punctuation noise. """
+    noisy = text.replace(". ", rng.choice([".  ", ".\n", "... "]))
+    if rng.random() < 0.5:
+        noisy = noisy.lower()
+    return noisy + rng.choice(["", " ", "!!", " :("])
+
+
+def wellbeing_score(rng, evidence):
+    adaptive, maladaptive = len(evidence["adaptive-state"]), len(evidence["maladaptive-state"])
+    balance = (adaptive - maladaptive) / max(adaptive + maladaptive, 1)
+    return max(1, min(10, round(5.5 + 4.5 * balance + rng.gauss(0, 1))))
+
+
+def generate_timelines(num_timelines=NUM_TIMELINES, seed=SEED, annotated=ANNOTATED, statements=None):
+    """
+    Schema-conformant timelines ({"timeline_id", "posts": [{"post_id", "post", ...}]}) with
+    sampled post lengths and exact/near duplicates of earlier posts. The same seed always
+    gives the same timelines.
+    """
+    rng = random.Random(seed)
+    statements = statements or load_statements()
+    timelines, earlier = [], []
+    stats = {"posts": 0, "words": 0, "duplicates": 0, "near_duplicates": 0}
+
+    for _ in range(num_timelines):
+        timeline_id = f"{rng.getrandbits(40):010x}"
+        posts = []
+        for i in range(rng.randint(*POSTS_PER_TIMELINE)):
+            roll = rng.random()
+            if earlier and roll < DUPLICATE_RATE:
+                text, evidence = rng.choice(earlier)
+                stats["duplicates"] += 1
+            elif earlier and roll < DUPLICATE_RATE + NEAR_DUPLICATE_RATE:
+                text, evidence = rng.choice(earlier)
+                text = perturb(rng, text)
+                stats["near_duplicates"] += 1
+            else:
+                text, evidence = generate_post(rng, statements, sample_post_words(rng))
+                earlier.append((text, evidence))
+
+            post = {"post_id": f"{timeline_id}_{i}", "post": text}
+            if annotated:
+                post["well-being_score"] = wellbeing_score(rng, evidence)
+                post["adaptive_evidence"] = evidence["adaptive-state"]
+                post["maladaptive_evidence"] = evidence["maladaptive-state"]
+                post["summary"] = " ".join(evidence["maladaptive-state"][:1] + evidence["adaptive-state"][:1])
+            posts.append(post)
+            stats["posts"] += 1
+            stats["words"] += len(text.split())
+
+        timeline = {"timeline_id": timeline_id, "posts": posts}
+        if annotated:
+            timeline["summary"] = " ".join(p["summary"] for p in posts[:3] if p["summary"])
+        timelines.append(timeline)
+    return timelines, stats
+
+
+def write_timelines(timelines, folder=OUTPUT_FOLDER):
+    """ One <timeline_id>.json per timeline, like the task folders read by read_json_files. """
+    os.makedirs(folder, exist_ok=True)
+    for timeline in timelines:
+        with open(os.path.join(folder, f"{timeline['timeline_id']}.json"), "w", encoding="utf-8") as f:
+            json.dump(timeline, f, indent=4, ensure_ascii=False)
+
+
+def generate_results(timelines, submissions=SUBMISSIONS, seed=SEED):
+    """ results_dev-style rows (timeline_id, metric, task, value, team_name, submission_id) for each submission. """
+    rng = random.Random(seed + 1)
+    rows = []
+    for submission in submissions:
+        # each submission gets its own quality level so rankings are stable but not flat
+        quality = rng.random()
+        for timeline in timelines:
+            for task, metric, count, (low, high) in METRICS:
+                for _ in range(len(timeline["posts"]) if count == "post" else count):
+                    # higher is better for every metric except the MSEs
+                    centre = low + (high - low) * (1 - quality if task == "A.2" else quality)
+                    value = min(high, max(low, rng.gauss(centre, (high - low) / 6)))
+                    rows.append({"timeline_id": timeline["timeline_id"], "metric": metric, "task": task,
+                                 "value": value, "team_name": submission, "submission_id": submission})
+    return pd.DataFrame(rows, columns=["timeline_id", "metric", "task", "value", "team_name", "submission_id"])
+
+
+def generate(folder=OUTPUT_FOLDER, results_path=RESULTS_PATH, num_timelines=NUM_TIMELINES, seed=SEED):
+    timelines, stats = generate_timelines(num_timelines, seed)
+    write_timelines(timelines, folder)
+    results = generate_results(timelines, seed=seed)
+    results.to_csv(results_path)  # keeps the unnamed index column of the results_dev files
+    print(f"Wrote {len(timelines)} timelines ({stats['posts']} posts, {stats['words']} words, "
+          f"{stats['duplicates']} duplicates, {stats['near_duplicates']} near-duplicates) to {folder}")
+    print(f"Wrote {len(results)} result rows to {results_path}")
+    return timelines, results
+
+
+if __name__ == "__main__":
+    generate()
@@ -0,0 +1,7 @@
+# Rough estimate for English text, no tokenizer needed. Shared by the chunker, the post batcher,
+# the prompt trimmer/ledger and the dry-run planner so their budgets agree.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
@@ -0,0 +1,194 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+LEASE_SECONDS = 300
+HEARTBEAT_SECONDS = 30
+MAX_ATTEMPTS = 5
+IDLE_POLL_SECONDS = 10
+
+POST_TASKS = ["extract_evidence", "predict_wellbeing", "summarize_post"]
+TIMELINE_TASKS = ["summarize_timeline"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    model TEXT NOT NULL,
+    timeline_id TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    task TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    UNIQUE (model, timeline_id, post_id, task)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, model);
+"""
+
+
+def connect(path):
+    """
+    Opens the queue database. The rollback journal (not WAL) is used because WAL needs shared
+    memory and does not work across machines on a network filesystem.
+    """
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def enqueue_sweep(conn, models, timelines):
+    """
+    Adds one job per (model, timeline, post, task); re-running it never duplicates jobs.
+    Returns the number of jobs actually added.
+    """
+    rows = []
+    for model in models:
+        for timeline in timelines:
+            timeline_id = timeline["timeline_id"]
+            for post in timeline["posts"]:
+                for task in POST_TASKS:
+                    rows.append((model, timeline_id, post["post_id"], task, json.dumps(post["post"])))
+            posts = [post["post"] for post in timeline["posts"]]
+            for task in TIMELINE_TASKS:
+                rows.append((model, timeline_id, "", task, json.dumps(posts)))
+    conn.execute("BEGIN IMMEDIATE")
+    changes_before = conn.total_changes
+    conn.executemany("INSERT OR IGNORE INTO jobs (model, timeline_id, post_id, task, payload) VALUES (?, ?, ?, ?, ?)",
+                     rows)
+    added = conn.total_changes - changes_before
+    conn.execute("COMMIT")
+    return added
+
+
+def lease(conn, worker, preferred_model=None, lease_seconds=LEASE_SECONDS):
+    """
+    Claims the next pending job, or one whose lease expired because its worker died.
+    Jobs for `preferred_model` come first so a worker keeps the model its Ollama has loaded.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("UPDATE jobs SET status = 'failed', error = 'lease expired' "
+                     "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, MAX_ATTEMPTS))
+        row = conn.execute(
+            """SELECT id, model, timeline_id, post_id, task, payload FROM jobs
+               WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ?
+               ORDER BY model = ? DESC, model, id LIMIT 1""",
+            (now, MAX_ATTEMPTS, preferred_model)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                     "WHERE id = ?", (worker, now + lease_seconds, row[0]))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    job_id, model, timeline_id, post_id, task, payload = row
+    return {"id": job_id, "model": model, "timeline_id": timeline_id, "post_id": post_id, "task": task,
+            "payload": json.loads(payload)}
+
+
+def heartbeat(conn, job_id, worker, lease_seconds=LEASE_SECONDS):
+    conn.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                 (time.time() + lease_seconds, job_id, worker))
+
+
+def complete(conn, job_id, result):
+    """ Stores a result once; a late duplicate from a worker whose lease was taken over is ignored. """
+    conn.execute("UPDATE jobs SET status = 'done', result = ?, lease_expires = NULL WHERE id = ? AND status != 'done'",
+                 (json.dumps(result, ensure_ascii=False), job_id))
+
+
+def fail(conn, job_id, worker, error):
+    conn.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ? "
+                 "WHERE id = ? AND worker = ? AND status = 'leased'", (MAX_ATTEMPTS, str(error), job_id, worker))
+
+
+def progress(conn):
+    return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+def run_worker(path, task_functions, use_model, once=False):
+    """
+    Drains the queue: leases a job, switches the script to the job's model, runs the task
+    function while a background thread renews the lease, and writes the result. Exceptions and
+    empty results send the job back to the queue until it has been tried MAX_ATTEMPTS times.
+    Exits when nothing is left to lease (or keeps polling unless `once`).
+    """
+    conn = connect(path)
+    worker = worker_name()
+    current_model = None
+    while True:
+        job = lease(conn, worker, current_model)
+        if job is None:
+            counts = progress(conn)
+            if once or not counts.get("leased"):
+                print(f"Queue drained: {counts}")
+                return
+            time.sleep(IDLE_POLL_SECONDS)  # other workers may still give up leases
+            continue
+
+        if job["model"] != current_model:
+            current_model = job["model"]
+            use_model(current_model)
+
+        stop = threading.Event()
+
+        def renew(job_id=job["id"]):
+            beat_conn = connect(path)
+            while not stop.wait(HEARTBEAT_SECONDS):
+                heartbeat(beat_conn, job_id, worker)
+            beat_conn.close()
+
+        beater = threading.Thread(target=renew, daemon=True)
+        beater.start()
+        try:
+            result = task_functions[job["task"]](job["payload"])
+            if not result:
+                # query_ollama returns {} once its own retries are exhausted; retry the job later
+                raise ValueError("empty result from the model")
+            complete(conn, job["id"], result)
+        except Exception as e:
+            print(f"Job {job['id']} ({job['task']}) failed: {e}")
+            fail(conn, job["id"], worker, e)
+        finally:
+            stop.set()
+            beater.join()
+
+
+def collect_submission(path, model):
+    """ Assembles the usual nested submission dict from the finished jobs of one model. """
+    conn = connect(path)
+    submission = {}
+    rows = conn.execute("SELECT timeline_id, post_id, task, result FROM jobs WHERE model = ? AND status = 'done' "
+                        "ORDER BY id", (model,))
+    for timeline_id, post_id, task, result in rows:
+        result = json.loads(result) or {}
+        timeline = submission.setdefault(timeline_id, {"timeline_level": {}, "post_level": {}})
+        if task == "summarize_timeline":
+            timeline["timeline_level"]["summary"] = result.get("summary", "")
+            continue
+        post = timeline["post_level"].setdefault(post_id, {
+            "adaptive_evidence": [], "maladaptive_evidence": [], "summary": "", "well-being score": 5})
+        if task == "extract_evidence":
+            post["adaptive_evidence"] = result.get("adaptive_evidence", [])
+            post["maladaptive_evidence"] = result.get("maladaptive_evidence", [])
+        elif task == "predict_wellbeing":
+            post["well-being score"] = result.get("wellbeing_score", 5)
+        elif task == "summarize_post":
+            post["summary"] = result.get("summary", "")
+    conn.close()
+    return submission